@@ -0,0 +1,204 @@
+import argparse
+import csv
+import getpass
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aci_session import run_with_credentials
+
+# Runs one of the scripts against every fabric of an inventory at once, one
+# process per fabric, each in its own output directory:
+#   python aci_batch.py report --inventory fabrics.csv
+#   python aci_batch.py cleanup-ports --inventory fabrics.csv -- aci_port_epg_report.csv
+# The inventory is a CSV with name,apic,username[,password] columns, or comes
+# from the environment (ACI_INVENTORY=<file>, or ACI_FABRICS=name=host,... with
+# ACI_USERNAME). Passwords not in the inventory are read from
+# ACI_PASSWORD_<NAME>, then ACI_PASSWORD, then asked for once.
+
+# --- SETTINGS ---
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = 'aci_batch'  # One subdirectory per fabric below this
+BATCH_WORKERS = 8  # Fabrics run at the same time
+MERGED_REPORT = 'aci_port_epg_report_all.csv'
+MERGED_OBJECTS = 'aci_batch_objects.jsonl'
+SUMMARY_FILE = 'aci_batch_summary.json'
+SCRIPTS = {
+    'report': 'aci_port_mapping_full.py',
+    'cleanup-ports': 'cleanup_down_ports.py',
+    'remove-epg-paths': 'aci_remove_multi_epg_from_csv.py',
+    'remove-vmm-domain': 'remove_old_VMM.py',
+}
+REPORT_FILE = 'aci_port_epg_report.csv'  # Written by the report in each fabric directory
+OBJECTS_FILE = 'objects.jsonl'  # --jsonl of the cleanup scripts
+METRICS_FILE = 'metrics.json'
+LOG_FILE = 'run.log'
+
+
+def password_env(name):
+    return "ACI_PASSWORD_" + re.sub(r'[^A-Z0-9]', '_', name.upper())
+
+
+def read_inventory(path=None):
+    # [{'name', 'apic', 'username', 'password'}] from a CSV or the environment
+    path = path or os.environ.get('ACI_INVENTORY')
+    if path:
+        with open(path, encoding="utf-8") as inventory_file:
+            fabrics = [{key: (value or '').strip() for key, value in row.items()}
+                       for row in csv.DictReader(inventory_file) if row.get('name', '').strip()]
+    else:
+        fabrics = []
+        for entry in filter(None, (e.strip() for e in os.environ.get('ACI_FABRICS', '').split(','))):
+            name, _, apic = entry.partition('=')
+            fabrics.append({'name': name.strip(), 'apic': apic.strip(), 'username': ''})
+    for fabric in fabrics:
+        fabric['username'] = fabric.get('username') or os.environ.get('ACI_USERNAME', '')
+        fabric['password'] = (fabric.get('password') or os.environ.get(password_env(fabric['name']))
+                              or os.environ.get('ACI_PASSWORD', ''))
+    return fabrics
+
+
+def writes_report(script, script_args):
+    # A report run writes the CSV unless it only looks up ports or EPGs
+    lookups = ('--port', '--epg')
+    return script == 'report' and not any(arg.split('=')[0] in lookups for arg in script_args)
+
+
+def run_fabric(fabric, script, script_args, outdir):
+    workdir = os.path.join(outdir, fabric['name'])
+    os.makedirs(workdir, exist_ok=True)
+    argv = [os.path.join(HERE, SCRIPTS[script]), *script_args, '--metrics-json', METRICS_FILE]
+    if script != 'report':
+        argv += ['--jsonl', OBJECTS_FILE]
+    if os.path.exists(os.path.join(workdir, OBJECTS_FILE)):
+        os.remove(os.path.join(workdir, OBJECTS_FILE))  # left by an earlier run, never merge it again
+    started = time.time()
+    with open(os.path.join(workdir, LOG_FILE), 'w') as log:
+        returncode, _ = run_with_credentials(argv, workdir, log, fabric['apic'], fabric['username'],
+                                             fabric['password'])
+    result = {'fabric': fabric['name'], 'apic': fabric['apic'], 'exit': returncode,
+              'seconds': round(time.time() - started, 3), 'dir': workdir}
+    # The scripts exit non-zero on a failed login, query or commit; a full
+    # report must also have left its CSV behind
+    result['ok'] = returncode == 0 and (
+        not writes_report(script, script_args) or os.path.exists(os.path.join(workdir, REPORT_FILE)))
+    metrics_path = os.path.join(workdir, METRICS_FILE)
+    if os.path.exists(metrics_path) and os.path.getmtime(metrics_path) >= started:
+        with open(metrics_path, encoding="utf-8") as metrics_file:
+            metrics = json.load(metrics_file)
+        result.update(phases=metrics['phases'], api=metrics['totals'])
+    return result
+
+
+def merge_reports(results, path):
+    # Every fabric's report in one CSV, with the fabric name in front
+    rows = 0
+    with open(path, 'w', newline='') as merged_file:
+        writer = None
+        for result in results:
+            report_path = os.path.join(result['dir'], REPORT_FILE)
+            if not result['ok'] or not os.path.exists(report_path):
+                continue
+            with open(report_path, newline='') as report_file:
+                reader = csv.DictReader(report_file)
+                if writer is None:
+                    writer = csv.DictWriter(merged_file, fieldnames=['Fabric'] + reader.fieldnames)
+                    writer.writeheader()
+                for row in reader:
+                    writer.writerow(dict(row, Fabric=result['fabric']))
+                    result['rows'] = result.get('rows', 0) + 1
+                    rows += 1
+    return rows
+
+
+def merge_objects(results, path):
+    # Every evaluated object of every fabric, tagged with its fabric
+    objects = 0
+    with open(path, 'w', encoding="utf-8") as merged_file:
+        for result in results:
+            objects_path = os.path.join(result['dir'], OBJECTS_FILE)
+            if not os.path.exists(objects_path):
+                continue
+            tags = Counter()
+            with open(objects_path, encoding="utf-8") as objects_file:
+                for line in objects_file:
+                    entry = json.loads(line)
+                    tags[entry['tag']] += 1
+                    merged_file.write(json.dumps(dict(fabric=result['fabric'], **entry)) + "\n")
+                    objects += 1
+            result['objects'] = dict(tags)
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a script against every fabric of an inventory in parallel.",
+                                     usage="%(prog)s SCRIPT [options] [-- script arguments]")
+    parser.add_argument('script', choices=sorted(SCRIPTS), help="what to run on each fabric")
+    parser.add_argument('--inventory', metavar='CSV',
+                        help="name,apic,username[,password] per fabric (default: $ACI_INVENTORY or $ACI_FABRICS)")
+    parser.add_argument('--fabric', dest='fabrics', action='append', metavar='NAME',
+                        help="only run these fabrics from the inventory; repeatable")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                        help=f"fabrics to run at the same time (default: {BATCH_WORKERS})")
+    parser.add_argument('--outdir', default=OUTPUT_DIR,
+                        help=f"directory for per-fabric outputs and the merged files (default: {OUTPUT_DIR})")
+    # Everything after -- goes to the script untouched
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    args.script_args = argv[split + 1:]
+
+    fabrics = read_inventory(args.inventory)
+    if args.fabrics:
+        fabrics = [fabric for fabric in fabrics if fabric['name'] in args.fabrics]
+    if not fabrics:
+        print("Error: no fabrics in the inventory (--inventory, ACI_INVENTORY or ACI_FABRICS). Exiting.")
+        sys.exit(1)
+    if not all(fabric['apic'] and fabric['username'] for fabric in fabrics):
+        print("Error: every fabric needs an APIC address and a username. Exiting.")
+        sys.exit(1)
+    if not all(fabric['password'] for fabric in fabrics):
+        password = getpass.getpass("Password for fabrics without one: ")
+        for fabric in fabrics:
+            fabric['password'] = fabric['password'] or password
+
+    os.makedirs(args.outdir, exist_ok=True)
+    print(f"Running {args.script} on {len(fabrics)} fabric(s), {args.workers} at a time...")
+    started = time.time()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(run_fabric, fabric, args.script, args.script_args, args.outdir) for fabric in fabrics]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"  -> [{'OK' if result['ok'] else 'FAILED'}] {result['fabric']:<16} "
+                  f"{result['seconds']:8.1f}s  {os.path.join(result['dir'], LOG_FILE)}")
+    elapsed = time.time() - started
+    results.sort(key=lambda result: result['fabric'])
+
+    if writes_report(args.script, args.script_args):
+        merged_path = os.path.join(args.outdir, MERGED_REPORT)
+        print(f"Merged report: {merge_reports(results, merged_path)} rows -> {merged_path}")
+    else:
+        merged_path = os.path.join(args.outdir, MERGED_OBJECTS)
+        print(f"Merged objects: {merge_objects(results, merged_path)} -> {merged_path}")
+
+    failed = [result['fabric'] for result in results if not result['ok']]
+    summary_path = os.path.join(args.outdir, SUMMARY_FILE)
+    with open(summary_path, 'w', encoding="utf-8") as summary_file:
+        json.dump({'script': args.script, 'args': args.script_args,
+                   'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': round(elapsed, 3),
+                   'slowest': max(result['seconds'] for result in results),
+                   'failed': failed, 'fabrics': results}, summary_file, indent=2)
+    print(f"\nSummary: fabrics={len(results)}, failed={len(failed)}{' (' + ', '.join(failed) + ')' if failed else ''}, "
+          f"{elapsed:.1f}s total, slowest fabric {max(result['seconds'] for result in results):.1f}s -> {summary_path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
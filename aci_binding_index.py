@@ -0,0 +1,131 @@
+from collections import defaultdict
+
+from aci_dn import Interface, parse_interface
+from aci_paths import BUNDLE_PREFIX
+
+
+PORT_FIELDS = (('fex', 0xFFFF), ('card', 0xFF), ('port', 0xFF), ('sub_port', 0xFF))
+
+
+def pack_port(node, card, port, sub_port=None, fex=None):
+    # One int per physical port: node | fex | card | port | sub-port. A field
+    # too wide for its bits would alias another port, so it is refused.
+    values = {'fex': fex or 0, 'card': card, 'port': port, 'sub_port': sub_port or 0}
+    for name, limit in PORT_FIELDS:
+        if not 0 <= values[name] <= limit:
+            raise ValueError(f"{name} {values[name]} of node {node} does not fit a packed port (max {limit})")
+    return (int(node) << 40) | (values['fex'] << 24) | (card << 16) | (port << 8) | values['sub_port']
+
+
+def unpack_port(packed):
+    fex = (packed >> 24) & 0xFFFF
+    sub_port = packed & 0xFF
+    interface = Interface((packed >> 16) & 0xFF, (packed >> 8) & 0xFF, sub_port or None, fex or None)
+    return str(packed >> 40), interface
+
+
+def interface_name(interface):
+    if interface.fex:
+        return f"eth{interface.fex}/{interface.card}/{interface.port}"
+    name = f"eth{interface.card}/{interface.port}"
+    if interface.sub_port:
+        return f"{name}/{interface.sub_port}"
+    return name
+
+
+class BindingIndex:
+    # Static EPG bindings per physical port. EPG names ("Tenant/AP/EPG") are
+    # interned to small integer IDs, so each name is stored once however many
+    # ports carry it, and ports are keyed by packed (node, card, port) ints.
+    # Both directions are sets of ints: adding a binding is O(1) on a trunk
+    # with hundreds of EPGs, and "which ports carry EPG X" needs no scan.
+    # Bindings on PC/vPC paths (paths-101/pathep-[PG] or
+    # protpaths-1005-1006/pathep-[PG]) are held per member node and policy
+    # group, the way PathIndex maps them, and show up on every member port
+    # whose selector uses accbundle-PG.
+
+    def __init__(self):
+        self._ids = {}  # EPG name -> id
+        self._names = []  # id -> EPG name, in first-seen order
+        self._by_port = defaultdict(set)  # packed port -> {EPG id}
+        self._by_epg = defaultdict(set)  # EPG id -> {packed port}
+        self._by_bundle = defaultdict(set)  # (member node, policy group) -> {EPG id}
+        self._bundles_by_epg = defaultdict(set)  # EPG id -> {(path node, policy group)}
+
+    def _pack(self, node, interface):
+        parsed = parse_interface(interface)
+        if not parsed or not str(node).isdigit():
+            return None
+        return pack_port(node, *parsed)
+
+    @staticmethod
+    def _members(node, interface):
+        # Member nodes of a PC/vPC path ("101" or "1005-1006"), else ()
+        nodes = str(node).split('-')
+        if not interface or interface.startswith('eth') or not all(n.isdigit() for n in nodes):
+            return ()
+        return nodes
+
+    def add(self, node, interface, epg_name):
+        packed = self._pack(node, interface)
+        members = self._members(node, interface) if packed is None else ()
+        if packed is None and not members:
+            return False
+        epg_id = self._ids.get(epg_name)
+        if epg_id is None:
+            epg_id = self._ids[epg_name] = len(self._names)
+            self._names.append(epg_name)
+        if packed is None:
+            for member in members:
+                self._by_bundle[(member, interface)].add(epg_id)
+            self._bundles_by_epg[epg_id].add((str(node), interface))
+            return True
+        self._by_port[packed].add(epg_id)
+        self._by_epg[epg_id].add(packed)
+        return True
+
+    def discard(self, node, interface, epg_name):
+        packed = self._pack(node, interface)
+        epg_id = self._ids.get(epg_name)
+        if epg_id is None:
+            return
+        if packed is None:
+            for member in self._members(node, interface):
+                self._by_bundle[(member, interface)].discard(epg_id)
+                if not self._by_bundle[(member, interface)]:
+                    del self._by_bundle[(member, interface)]
+            self._bundles_by_epg[epg_id].discard((str(node), interface))
+            return
+        self._by_port[packed].discard(epg_id)
+        if not self._by_port[packed]:
+            del self._by_port[packed]
+        self._by_epg[epg_id].discard(packed)
+
+    def __len__(self):
+        # Number of bound ports
+        return len(self._by_port)
+
+    def epg_count(self):
+        return sum(1 for epg_id in range(len(self._names))
+                   if self._by_epg.get(epg_id) or self._bundles_by_epg.get(epg_id))
+
+    def epgs(self, node, card, port, sub_port=None, fex=None, policy_group=None):
+        # EPG names bound to a port, or to the PC/vPC its accbundle- policy
+        # group makes it a member of, in the order the EPGs were first seen
+        try:
+            epg_ids = self._by_port.get(pack_port(node, card, port, sub_port, fex), set())
+        except ValueError:
+            epg_ids = set()  # a selector block beyond any real port; nothing can be bound to it
+        if policy_group and policy_group.startswith(BUNDLE_PREFIX):
+            epg_ids = epg_ids | self._by_bundle.get((str(node), policy_group[len(BUNDLE_PREFIX):]), set())
+        return [self._names[i] for i in sorted(epg_ids)]
+
+    def ports(self, epg_name):
+        # (node, interface name) of every port carrying an EPG, then
+        # (path node, policy group) of every PC/vPC carrying it
+        epg_id = self._ids.get(epg_name)
+        if epg_id is None:
+            return []
+        ports = [(node, interface_name(interface))
+                 for node, interface in map(unpack_port, sorted(self._by_epg[epg_id]))]
+        return ports + sorted(self._bundles_by_epg.get(epg_id, ()))
@@ -0,0 +1,101 @@
+from typing import NamedTuple
+from urllib.parse import quote
+
+# --- SETTINGS ---
+# URL-encoded bytes of query-target-filter per request. 100 fvRsPathAtt DNs
+# already encode to ~15KB and risk a 414, so filters are cut by size, not count.
+FILTER_MAX_BYTES = 6 * 1024
+
+
+class QuerySpec(NamedTuple):
+    # What a class query consumes, translated to APIC response options:
+    # subtree_classes -> rsp-subtree-class, prop_include -> rsp-prop-include,
+    # target_filter -> query-target-filter. rsp-prop-include takes a category
+    # (all, naming-only, config-only, ...) rather than a property list.
+    class_name: str
+    subtree: str = None
+    subtree_classes: tuple = ()
+    prop_include: str = None
+    target_filter: str = None
+
+
+def class_query(spec, page=None, page_size=None):
+    from cobra.mit.request import ClassQuery
+
+    query = ClassQuery(spec.class_name)
+    if spec.subtree:
+        query.subtree = spec.subtree
+    if spec.subtree_classes:
+        query.subtreeClassFilter = ",".join(spec.subtree_classes)
+    if spec.prop_include:
+        query.propInclude = spec.prop_include
+    if spec.target_filter:
+        query.propFilter = spec.target_filter
+    if page_size:
+        # Pages are only stable under a fixed sort; without one APIC may
+        # skip or repeat objects across pages while the fabric changes
+        query.orderBy = f"{spec.class_name}.dn"
+        query.page = page
+        query.pageSize = page_size
+    return query
+
+
+def or_filter(terms):
+    if len(terms) == 1:
+        return terms[0]
+    return f"or({','.join(terms)})"
+
+
+def encoded_size(text):
+    return len(quote(text, safe=''))
+
+
+def filter_chunks(terms, max_bytes=FILTER_MAX_BYTES):
+    # or(...) filters over consecutive runs of terms, each at most max_bytes
+    # once URL-encoded (a single longer term still gets a filter of its own)
+    chunk, size = [], encoded_size("or()")
+    for term in terms:
+        term_size = encoded_size(term) + encoded_size(",")
+        if chunk and size + term_size > max_bytes:
+            yield or_filter(chunk)
+            chunk, size = [], encoded_size("or()")
+        chunk.append(term)
+        size += term_size
+    if chunk:
+        yield or_filter(chunk)
+
+
+def query_by_dns(mo_dir, class_name, dns, max_bytes=FILTER_MAX_BYTES):
+    # One filtered class query per size-bounded chunk of DNs instead of one
+    # lookupByDn per DN. Returns {dn: mo} for the DNs that exist; missing DNs
+    # are absent.
+    from cobra.mit.request import ClassQuery
+
+    found = {}
+    terms = [f'eq({class_name}.dn,"{dn}")' for dn in sorted(set(dns))]
+    for prop_filter in filter_chunks(terms, max_bytes):
+        query = ClassQuery(class_name)
+        query.propFilter = prop_filter
+        for mo in mo_dir.query(query):
+            found[str(mo.dn)] = mo
+    return found
+
+
+def query_dn_set(mo_dir, class_name, prop_filter=None):
+    # DNs of every object of a class matching the filter, for set membership
+    from cobra.mit.request import ClassQuery
+
+    query = ClassQuery(class_name)
+    if prop_filter:
+        query.propFilter = prop_filter
+    return {str(mo.dn) for mo in mo_dir.query(query)}
+
+
+def query_node_class(mo_dir, pod, node, class_name):
+    # Every object of one class on one switch, e.g. all ethpmPhysIf of a leaf
+    from cobra.mit.request import DnQuery
+
+    query = DnQuery(f"topology/pod-{pod}/node-{node}/sys")
+    query.queryTarget = 'subtree'
+    query.classFilter = class_name
+    return mo_dir.query(query)
@@ -0,0 +1,51 @@
+import time
+
+STARTED = time.perf_counter()  # Before any other import, so the import time is measured
+
+import argparse
+import importlib
+import sys
+
+# One entry point for the scripts:
+#   python aci_cli.py report --snapshot
+#   python aci_cli.py cleanup-ports aci_port_epg_report.csv
+# Only the chosen command's module is imported, and none of them imports the
+# cobra model packages (cobra.model.infra, cobra.model.fv) until a step needs
+# them, so input files are checked and credentials asked for within a fraction
+# of a second. The startup line shows where that time went; run with
+# python -X importtime for a per-module breakdown.
+
+# --- SETTINGS ---
+COMMANDS = {
+    'report': ('aci_port_mapping_full', "export the port / EPG / selector report"),
+    'cleanup-ports': ('cleanup_down_ports', "delete interface selectors whose ports are all down"),
+    'remove-epg-paths': ('aci_remove_multi_epg_from_csv', "remove static EPG path bindings from down ports"),
+    'remove-vmm-domain': ('remove_old_VMM', "remove a VMM domain attachment from EPGs"),
+}
+MODEL_PACKAGES = ('cobra.model.infra', 'cobra.model.fv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ACI port report and cleanup scripts.",
+                                     epilog="Run '%(prog)s COMMAND --help' for the options of a command.")
+    parser.add_argument('command', choices=COMMANDS, metavar='COMMAND',
+                        help="; ".join(f"{name}: {text}" for name, (_, text) in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="arguments of the command")
+    parser.add_argument('--quiet-startup', action='store_true', help="do not print the startup timing line")
+    args = parser.parse_args()
+
+    imported = time.perf_counter()
+    module = importlib.import_module(COMMANDS[args.command][0])
+    loaded = time.perf_counter()
+    command_args = module.build_parser(f"{parser.prog} {args.command}").parse_args(args.args)
+
+    if not args.quiet_startup:
+        models = [name for name in MODEL_PACKAGES if name in sys.modules]
+        print(f"[startup] {args.command}: ready in {time.perf_counter() - STARTED:.2f}s "
+              f"(cli {imported - STARTED:.2f}s, {module.__name__} {loaded - imported:.2f}s; "
+              f"cobra models loaded: {', '.join(models) or 'none'})")
+    module.run(command_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cobra.mit.request
+
+# --- SETTINGS ---
+CHUNK_MAX_MOS = 200  # MOs per ConfigRequest
+CHUNK_MAX_BYTES = 256 * 1024  # Approximate payload per ConfigRequest
+COMMIT_WORKERS = 4  # ConfigRequests in flight at once
+MAX_RETRIES = 4  # Retries per chunk on transient failures
+RETRY_BASE_DELAY = 2.0  # Seconds, doubled on every retry
+MO_XML_OVERHEAD = 64  # Bytes per deleted MO on top of its DN
+
+
+def is_transient(error):
+    # 4xx answers (bad DN, validation, permission) will fail again as they
+    # are; timeouts, dropped connections, 429 and 5xx are worth a retry.
+    code = getattr(error, 'httpCode', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return True
+    return code == 429 or code >= 500
+
+
+def run_id(*parts):
+    # Names a run in the journal. A re-run with the same parts (script, input
+    # digest, plan id) resumes it; anything else starts from scratch.
+    return hashlib.sha1("\0".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+def file_digest(path):
+    with open(path, 'rb') as input_file:
+        return hashlib.sha1(input_file.read()).hexdigest()
+
+
+def read_entries(journal_path):
+    if not journal_path or not os.path.exists(journal_path):
+        return []
+    entries = []
+    with open(journal_path, encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+    return entries
+
+
+def read_journal(journal_path, run=None, apic=None):
+    # DNs committed by an interrupted earlier attempt at this run on this
+    # APIC: those after its last 'finished' event. Unscoped engines never
+    # resume.
+    if run is None:
+        return set()
+    committed = set()
+    for entry in read_entries(journal_path):
+        if entry.get('run') != run or entry.get('apic') != apic:
+            continue
+        if entry.get('event') == 'committed':
+            committed.add(entry['dn'])
+        elif entry.get('event') == 'finished':
+            committed.clear()
+    return committed
+
+
+class CommitEngine:
+    # Queues MOs, splits them into size-bounded chunks and commits the chunks
+    # with bounded concurrency. Every committed DN is appended to the journal
+    # under the run id and APIC, and DNs the same run already committed on
+    # the same APIC are skipped, so re-running after an interruption only
+    # sends what is left. The journal is append-only: a run that commits
+    # everything ends with a 'finished' event, and the next run with the
+    # same id starts from scratch.
+
+    def __init__(self, mo_dir, journal_path=None, run=None, apic=None, workers=COMMIT_WORKERS,
+                 chunk_mos=CHUNK_MAX_MOS, chunk_bytes=CHUNK_MAX_BYTES, retries=MAX_RETRIES):
+        self.mo_dir = mo_dir
+        self.journal_path = journal_path
+        self.run = run
+        self.apic = apic
+        self.workers = max(1, workers)
+        self.chunk_mos = chunk_mos
+        self.chunk_bytes = chunk_bytes
+        self.retries = retries
+        self.already_committed = read_journal(journal_path, run, apic)
+        self.queued = []
+        self.skipped = 0
+
+    def add(self, mo):
+        if str(mo.dn) in self.already_committed:
+            self.skipped += 1
+            return False
+        self.queued.append(mo)
+        return True
+
+    def __len__(self):
+        return len(self.queued)
+
+    def chunks(self):
+        chunk, size = [], 0
+        for mo in self.queued:
+            mo_size = len(str(mo.dn)) + MO_XML_OVERHEAD
+            if chunk and (len(chunk) >= self.chunk_mos or size + mo_size > self.chunk_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(mo)
+            size += mo_size
+        if chunk:
+            yield chunk
+
+    def _commit_chunk(self, chunk):
+        attempt = 0
+        while True:
+            config_request = cobra.mit.request.ConfigRequest()
+            for mo in chunk:
+                config_request.addMo(mo)
+            try:
+                self.mo_dir.commit(config_request)
+                return attempt
+            except Exception as error:
+                if attempt >= self.retries or not is_transient(error):
+                    raise
+                delay = RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.8, 1.2)
+                attempt += 1
+                note_retry = getattr(self.mo_dir, 'note_retry', None)  # set by aci_metrics
+                if note_retry:
+                    note_retry()
+                print(f"  -> [RETRY {attempt}/{self.retries}] Chunk of {len(chunk)} failed ({error}), "
+                      f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _journal(self, journal, entry):
+        if journal:
+            journal.write(json.dumps(dict(entry, run=self.run, apic=self.apic)) + "\n")
+            journal.flush()
+
+    def _finish(self):
+        with open(self.journal_path, 'a', encoding="utf-8") as journal:
+            self._journal(journal, {'event': 'finished', 'ts': time.time()})
+
+    def commit(self):
+        chunks = list(self.chunks())
+        summary = {'queued': len(self.queued), 'skipped': self.skipped, 'chunks': len(chunks),
+                   'committed': 0, 'failed': 0, 'retries': 0}
+        if self.skipped:
+            print(f"[RESUME] {self.skipped} MO(s) already committed according to {self.journal_path}, skipping.")
+        if not chunks:
+            summary.update(seconds=0.0, mos_per_sec=0.0)
+            if self.skipped:
+                self._finish()
+            return summary
+
+        print(f"Committing {len(self.queued)} MO(s) in {len(chunks)} chunk(s), {self.workers} at a time...")
+        started = time.time()
+        journal = open(self.journal_path, 'a', encoding="utf-8") if self.journal_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+                futures = {pool.submit(self._commit_chunk, chunk): (i, chunk) for i, chunk in enumerate(chunks)}
+                for future in as_completed(futures):
+                    i, chunk = futures[future]
+                    try:
+                        summary['retries'] += future.result()
+                    except Exception as error:
+                        summary['failed'] += len(chunk)
+                        print(f"  -> [FAILED] Chunk {i + 1}/{len(chunks)} ({len(chunk)} MOs): {error}")
+                        self._journal(journal, {'event': 'failed', 'chunk': i, 'ts': time.time(),
+                                                'error': str(error), 'dns': [str(mo.dn) for mo in chunk]})
+                        continue
+                    summary['committed'] += len(chunk)
+                    now = time.time()
+                    for mo in chunk:
+                        self._journal(journal, {'event': 'committed', 'dn': str(mo.dn), 'chunk': i, 'ts': now})
+                    print(f"  -> [OK] Chunk {i + 1}/{len(chunks)} ({len(chunk)} MOs)")
+            elapsed = time.time() - started
+            summary.update(seconds=round(elapsed, 3),
+                           mos_per_sec=round(summary['committed'] / elapsed, 1) if elapsed else 0.0)
+            self._journal(journal, dict(event='summary', ts=time.time(), **summary))
+        finally:
+            if journal:
+                journal.close()
+        if journal and not summary['failed']:
+            self._finish()
+        return summary
+
+
+def format_summary(summary):
+    return (f"committed={summary['committed']}, failed={summary['failed']}, "
+            f"resumed/skipped={summary['skipped']}, chunks={summary['chunks']}, retries={summary['retries']}, "
+            f"{summary['seconds']:.1f}s ({summary['mos_per_sec']:.1f} MOs/sec)")
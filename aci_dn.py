@@ -0,0 +1,131 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# --- SETTINGS ---
+DN_CACHE_SIZE = 65536  # Distinct DN strings memoised by parse_dn()
+
+# Every component we care about, matched in a single left-to-right scan. A
+# token starts at the beginning of the DN, after a "/" or just inside the
+# bracket of a relation RN, so a tenant called "Wrap-T" is never mistaken for
+# an "ap-" RN and the target DN of rspathAtt-[...] is scanned in the same pass.
+# Bracketed values may nest one level deep, which is as far as ACI goes.
+DN_TOKEN_RE = re.compile(r"""
+    (?:^|[/\[])(?:
+        tn-(?P<tenant>[^/\[\]]+)
+      | ap-(?P<ap>[^/\[\]]+)
+      | epg-(?P<epg>[^/\[\]]+)
+      | pod-(?P<pod>\d+)
+      | node-(?P<node>\d+)
+      | (?P<path>(?:prot)?paths-\d+(?:-\d+)?)
+      | extpaths-(?P<fex>\d+)
+      | (?:pathep|phys)-\[(?P<interface>(?:[^\[\]]|\[[^\[\]]*\])+)\]
+      | accportprof-(?P<profile>[^/\[\]]+)
+      | hports-(?P<selector>[^/\[\]]+?)-typ-[a-zA-Z]+
+    )""", re.X)
+
+# Anchored fast path for the two shapes the report parses by the thousand:
+# fvRsPathAtt and ethpmPhysIf. Anything else goes through the token scan.
+PATH_ATT_RE = re.compile(
+    r'uni/tn-([^/\[\]]+)/ap-([^/\[\]]+)/epg-([^/\[\]]+)/rspathAtt-\['
+    r'topology/pod-(\d+)/((?:prot)?paths-(\d+(?:-\d+)?)(?:/extpaths-(\d+))?)/pathep-\[([^\[\]]+)\]\]$')
+PHYS_RE = re.compile(r'topology/pod-(\d+)/node-(\d+)/sys/phys-\[([^\[\]]+)\]/phys$')
+INTERFACE_RE = re.compile(r'eth(\d+)/(\d+)(?:/(\d+))?$')
+FEX_MIN_ID = 100  # eth101/1/3 is FEX 101 port 1/3, eth1/1/2 is breakout 1/1 sub-port 2
+
+
+class AciDn(NamedTuple):
+    tenant: str = None
+    ap: str = None
+    epg: str = None
+    pod: str = None
+    node: str = None       # "101", or "1005-1006" for a vPC path
+    path: str = None       # "paths-101", "protpaths-1005-1006", "paths-101/extpaths-110"
+    interface: str = None  # "eth1/1", "eth110/1/1" or a PC/vPC policy group name
+    profile: str = None    # infraAccPortP name
+    selector: str = None   # infraHPortS name
+
+
+class Interface(NamedTuple):
+    card: int
+    port: int
+    sub_port: int = None
+    fex: int = None
+
+
+@lru_cache(maxsize=DN_CACHE_SIZE)
+def parse_dn(dn):
+    match = PATH_ATT_RE.match(dn)
+    if match:
+        tenant, ap, epg, pod, path, node, fex, interface = match.groups()
+        if fex and interface.startswith('eth'):
+            interface = f"eth{fex}/{interface[3:]}"
+        return AciDn(tenant, ap, epg, pod, node, path, interface)
+    match = PHYS_RE.match(dn)
+    if match:
+        pod, node, interface = match.groups()
+        return AciDn(pod=pod, node=node, interface=interface)
+
+    fields = {}
+    fex = None
+    for match in DN_TOKEN_RE.finditer(dn):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'path':
+            # paths-101 or protpaths-1005-1006: the node part doubles as node
+            fields['path'] = value
+            fields['node'] = value.split('-', 1)[1]
+        elif kind == 'fex':
+            fex = value
+            fields['path'] = f"{fields.get('path', '')}/extpaths-{value}".lstrip('/')
+        elif kind not in fields:
+            # The source side of a relation DN comes first and wins
+            fields[kind] = value
+    if fex and fields.get('interface', '').startswith('eth'):
+        # FEX host ports are addressed as ethFEX/card/port on the leaf
+        fields['interface'] = f"eth{fex}/{fields['interface'][3:]}"
+    return AciDn(**fields)
+
+
+@lru_cache(maxsize=DN_CACHE_SIZE)
+def parse_interface(name):
+    match = INTERFACE_RE.match(name or '')
+    if not match:
+        return None
+    first, second, third = match.groups()
+    if third is None:
+        return Interface(int(first), int(second))
+    if int(first) >= FEX_MIN_ID:
+        return Interface(int(second), int(third), fex=int(first))
+    return Interface(int(first), int(second), sub_port=int(third))
+
+
+def port_key(node, interface):
+    # Lookup key shared by the report maps: "101/1/5" for node 101 eth1/5
+    return f"{node}/{interface[3:] if interface.startswith('eth') else interface}"
+
+
+# --- DN builders ---
+
+def epg_dn(tenant, ap, epg):
+    return f"uni/tn-{tenant}/ap-{ap}/epg-{epg}"
+
+
+def path_dn(pod, node, interface):
+    return f"topology/pod-{pod}/paths-{node}/pathep-[{interface}]"
+
+
+def path_att_dn(tenant, ap, epg, path):
+    return f"{epg_dn(tenant, ap, epg)}/rspathAtt-[{path}]"
+
+
+def dom_att_dn(tenant, ap, epg, domain_dn):
+    return f"{epg_dn(tenant, ap, epg)}/rsdomAtt-[{domain_dn}]"
+
+
+def phys_dn(pod, node, interface):
+    return f"topology/pod-{pod}/node-{node}/sys/phys-[{interface}]/phys"
+
+
+def selector_dn(profile, selector, selector_type='range'):
+    return f"uni/infra/accportprof-{profile}/hports-{selector}-typ-{selector_type}"
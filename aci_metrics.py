@@ -0,0 +1,235 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-phase timings and API call statistics for one script run. Scripts wrap
+# their MoDirectory in InstrumentedMoDirectory and mark each step with
+#   metrics.begin('prefetch')
+# Every call is booked to (phase, kind, target) with its latency, objects
+# returned, payload bytes, errors and retries. --metrics-json and
+# --metrics-prom write the totals when the script exits; the Prometheus file
+# is meant for node_exporter's textfile collector.
+
+# --- SETTINGS ---
+PROM_PREFIX = 'aci_script'
+FIRST_PHASE = 'setup'  # Calls made before the first phase is entered
+CALL_FIELDS = ('calls', 'errors', 'retries', 'seconds', 'max_seconds', 'objects', 'bytes')
+
+
+def requests_session(mo_dir):
+    # cobra keeps one requests.Session on the MoDirectory's access object; the
+    # attribute name differs between cobra releases, so find it by shape
+    access = getattr(mo_dir, '_accessImpl', None)
+    for value in vars(access).values() if access is not None else ():
+        if hasattr(value, 'hooks') and hasattr(value, 'send'):
+            return value
+    return None
+
+
+class Metrics:
+
+    def __init__(self, script):
+        self.script = script
+        self.started = time.time()
+        self.current = FIRST_PHASE
+        self.phases = {}  # phase -> wall seconds, in the order entered
+        self.calls = {}  # (phase, kind, target) -> {field: total}
+        self._phase_started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def begin(self, name):
+        # Close the current phase and start the next one. Called from the main
+        # thread between steps; calls made by worker threads are booked to
+        # whichever phase is current.
+        now = time.perf_counter()
+        with self._lock:
+            self.phases[self.current] = self.phases.get(self.current, 0.0) + now - self._phase_started
+            self.current = name
+            self._phase_started = now
+
+    @contextmanager
+    def phase(self, name):
+        # A phase nested in another, e.g. a login made on first use; the outer
+        # phase resumes afterwards
+        previous = self.current
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.begin(previous)
+
+    def _entry(self, kind, target):
+        key = (self.current, kind, target)
+        entry = self.calls.get(key)
+        if entry is None:
+            entry = self.calls[key] = dict.fromkeys(CALL_FIELDS, 0)
+        return entry
+
+    def record(self, kind, target, seconds, objects=0, size=0, error=False):
+        with self._lock:
+            entry = self._entry(kind, target)
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['objects'] += objects
+            entry['bytes'] += size
+
+    def retry(self, kind, target):
+        with self._lock:
+            self._entry(kind, target)['retries'] += 1
+
+    def summary(self):
+        calls = [dict(phase=phase, kind=kind, target=target, **{
+                     field: round(value, 4) if isinstance(value, float) else value for field, value in entry.items()})
+                 for (phase, kind, target), entry in self.calls.items()]
+        totals = {field: sum(call[field] for call in calls) for field in CALL_FIELDS if field != 'max_seconds'}
+        return {
+            'script': self.script,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': round(time.time() - self.started, 3),
+            'phases': {phase: round(seconds, 4) for phase, seconds in self.phases.items() if seconds},
+            'totals': {field: round(value, 4) if isinstance(value, float) else value for field, value in totals.items()},
+            'calls': calls,
+        }
+
+    def format_phases(self):
+        # One line per phase for the terminal: wall time, calls and bytes
+        lines = []
+        for phase, seconds in self.phases.items():
+            if not seconds:
+                continue
+            entries = [entry for (name, _, _), entry in self.calls.items() if name == phase]
+            lines.append(f"  {phase:<16} {seconds:8.2f}s {sum(e['calls'] for e in entries):6} calls "
+                         f"{sum(e['bytes'] for e in entries) / 1e6:9.2f} MB")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, 'w', encoding="utf-8") as metrics_file:
+            json.dump(self.summary(), metrics_file, indent=2)
+
+    def write_prometheus(self, path):
+        # Written beside the target and renamed over it, so the textfile
+        # collector never reads a half-written file
+        summary = self.summary()
+        script = f'script="{self.script}"'
+        lines = [
+            f"# HELP {PROM_PREFIX}_last_run_timestamp_seconds Start time of the last run.",
+            f"# TYPE {PROM_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROM_PREFIX}_last_run_timestamp_seconds{{{script}}} {self.started:.3f}",
+            f"# HELP {PROM_PREFIX}_duration_seconds Wall time of the last run.",
+            f"# TYPE {PROM_PREFIX}_duration_seconds gauge",
+            f"{PROM_PREFIX}_duration_seconds{{{script}}} {summary['seconds']}",
+            f"# HELP {PROM_PREFIX}_phase_seconds Wall time per phase of the last run.",
+            f"# TYPE {PROM_PREFIX}_phase_seconds gauge",
+        ]
+        lines += [f'{PROM_PREFIX}_phase_seconds{{{script},phase="{phase}"}} {seconds}'
+                  for phase, seconds in summary['phases'].items()]
+        for field, help_text in (('calls', "API calls"), ('errors', "API calls that raised"),
+                                 ('retries', "API calls retried"), ('seconds', "Seconds spent in API calls"),
+                                 ('max_seconds', "Slowest single API call"), ('objects', "Objects returned"),
+                                 ('bytes', "Request plus response payload bytes")):
+            name = f"{PROM_PREFIX}_api_{field}"
+            lines += [f"# HELP {name} {help_text} per phase, kind and target in the last run.",
+                      f"# TYPE {name} gauge"]
+            lines += [f'{name}{{{script},phase="{call["phase"]}",kind="{call["kind"]}",target="{call["target"]}"}} '
+                      f'{call[field]}' for call in summary['calls']]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as prom_file:
+            prom_file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def write(self, json_path=None, prom_path=None):
+        if not json_path and not prom_path:
+            return
+        self.begin(self.current)  # book the time of the phase still open
+        print(f"\nPhase timings ({self.script}):\n{self.format_phases()}")
+        if json_path:
+            self.write_json(json_path)
+            print(f"Metrics written to {json_path}")
+        if prom_path:
+            self.write_prometheus(prom_path)
+            print(f"Prometheus metrics written to {prom_path}")
+
+
+class InstrumentedMoDirectory:
+    # Drop-in for cobra.mit.access.MoDirectory that books every login, query,
+    # lookup and commit to a Metrics. Payload bytes are counted with a
+    # response hook on cobra's requests session; the hook runs on the thread
+    # that made the call, so the count stays per call under worker threads.
+
+    def __init__(self, mo_dir, metrics):
+        self._mo_dir = mo_dir
+        self.metrics = metrics
+        self._local = threading.local()
+        session = requests_session(mo_dir)
+        if session is not None:
+            session.hooks.setdefault('response', []).append(self._count_bytes)
+
+    def __getattr__(self, name):
+        return getattr(self._mo_dir, name)
+
+    def _count_bytes(self, response, *args, **kwargs):
+        body = response.request.body or b''
+        self._local.bytes = getattr(self._local, 'bytes', 0) + len(response.content) + len(body)
+
+    def _call(self, kind, target, func, *args):
+        self._local.bytes = 0
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception:
+            self.metrics.record(kind, target, time.perf_counter() - started, size=self._local.bytes, error=True)
+            raise
+        if kind == 'commit':
+            objects = 0
+        elif isinstance(result, list):
+            objects = len(result)
+        else:
+            objects = int(result is not None)
+        self.metrics.record(kind, target, time.perf_counter() - started, objects, self._local.bytes)
+        return result
+
+    def login(self):
+        return self._call('login', 'aaaLogin', self._mo_dir.login)
+
+    def logout(self):
+        return self._call('logout', 'aaaLogout', self._mo_dir.logout)
+
+    def query(self, query_object):
+        class_name = getattr(query_object, 'className', None)
+        if class_name:
+            return self._call('class_query', class_name, self._mo_dir.query, query_object)
+        return self._call('dn_query', getattr(query_object, 'classFilter', None) or 'mo',
+                          self._mo_dir.query, query_object)
+
+    def lookupByDn(self, dn_str):
+        return self._call('lookup_dn', 'mo', self._mo_dir.lookupByDn, dn_str)
+
+    def lookupByClass(self, class_names, *args):
+        target = class_names if isinstance(class_names, str) else ",".join(class_names)
+        return self._call('lookup_class', target, self._mo_dir.lookupByClass, class_names, *args)
+
+    def commit(self, config_request):
+        return self._call('commit', 'ConfigRequest', self._mo_dir.commit, config_request)
+
+    def note_retry(self, kind='commit', target='ConfigRequest'):
+        # Called by CommitEngine before it re-sends a failed chunk
+        self.metrics.retry(kind, target)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-json", metavar="FILE",
+                        help="on exit, write per-phase timings and API call statistics as JSON")
+    parser.add_argument("--metrics-prom", metavar="FILE",
+                        help="on exit, write the same statistics as a Prometheus textfile (node_exporter)")
+
+
+def start_metrics(script, args):
+    # Metrics for this run, written on exit when either output was asked for
+    metrics = Metrics(script)
+    atexit.register(metrics.write, args.metrics_json, args.metrics_prom)
+    return metrics
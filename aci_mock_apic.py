@@ -0,0 +1,433 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import quoteattr
+
+# Local stand-in for the APIC REST API, enough for every script here to run
+# end to end: aaaLogin/aaaRefresh/aaaLogout, class queries, DN queries
+# (lookupByDn and subtree class filters) and config commits that delete, in
+# both the XML cobra speaks by default and JSON. The fabric is synthetic and
+# held in memory; every request can be delayed to mimic a remote controller.
+#   python aci_mock_apic.py --leaves 200 --ports 48 --epgs 5000 --latency 0.05
+# Point a script at it by answering the host prompt with http://127.0.0.1:8443
+
+# --- SETTINGS ---
+MOCK_PORT = 8443
+MOCK_TENANTS = ['Production-TNT', 'Dev-TNT', 'Shared-TNT']  # Production-TNT is remove_old_VMM's tenant
+MOCK_VMM_DOMAIN = 'uni/vmmp-VMware/dom-W7_MX1000_VDS-New'  # remove_old_VMM's DOMAIN_DN
+VPC_BINDING_RATIO = 0.1  # Share of static bindings on a vPC instead of a single port
+TOKEN_TIMEOUT = 600
+
+# RNs of the classes a commit body may carry without dn/rn attributes
+RN_FORMATS = {
+    'polUni': 'uni', 'infraInfra': 'infra', 'fvTenant': 'tn-{name}', 'fvAp': 'ap-{name}', 'fvAEPg': 'epg-{name}',
+    'fvRsPathAtt': 'rspathAtt-[{tDn}]', 'fvRsDomAtt': 'rsdomAtt-[{tDn}]', 'infraAccPortP': 'accportprof-{name}',
+    'infraHPortS': 'hports-{name}-typ-{type}', 'infraPortBlk': 'portblk-{name}',
+}
+
+
+class Fabric:
+    # In-memory MIT: dn -> (class, attributes), children in creation order
+
+    def __init__(self):
+        self.mos = {}
+        self.parent = {}  # dn -> parent dn
+        self.children = defaultdict(dict)  # parent dn -> {child dn: None}
+        self.by_class = defaultdict(dict)  # class -> {dn: None}
+        self.lock = threading.Lock()
+
+    def add(self, parent_dn, class_name, rn, **attrs):
+        dn = f"{parent_dn}/{rn}" if parent_dn else rn
+        self.mos[dn] = (class_name, attrs)
+        self.parent[dn] = parent_dn
+        self.children[parent_dn][dn] = None
+        self.by_class[class_name][dn] = None
+        return dn
+
+    def descendants(self, dn):
+        for child_dn in self.children.get(dn, ()):
+            yield child_dn
+            yield from self.descendants(child_dn)
+
+    def delete(self, dn):
+        if dn not in self.mos:
+            return 0
+        removed = 1
+        for child_dn in list(self.children.get(dn, ())):
+            removed += self.delete(child_dn)
+        self.children.pop(dn, None)
+        class_name, _ = self.mos.pop(dn)
+        self.by_class[class_name].pop(dn, None)
+        self.children[self.parent.pop(dn)].pop(dn, None)
+        return removed
+
+
+def synthetic_fabric(leaves=20, ports=48, epgs=500, bindings_per_epg=4, pods=1, down_ratio=0.3, seed=7):
+    # leaves x ports access ports, one interface profile and one switch
+    # profile per leaf, one selector per port, and epgs EPGs each statically
+    # bound to a few random ports and attached to the VMM domain. Leaves of a
+    # pod are paired up; the last port of each pair is one vPC, and some
+    # bindings go to the vPC path instead of a single port.
+    rng = random.Random(seed)
+    fabric = Fabric()
+    nodes = [(1 + i % pods, 101 + i) for i in range(leaves)]
+    vpcs = {}  # node -> (vPC policy group, protpaths DN)
+    for pod in range(1, pods + 1):
+        pod_nodes = [node for node_pod, node in nodes if node_pod == pod]
+        for a, b in zip(pod_nodes[::2], pod_nodes[1::2]):
+            name = f"VPC_{a}_{b}"
+            container_dn = fabric.add(f"topology/pod-{pod}", 'fabricProtPathEpCont', f"protpaths-{a}-{b}",
+                                      nodeAId=str(a), nodeBId=str(b))
+            vpcs[a] = vpcs[b] = (name, fabric.add(container_dn, 'fabricPathEp', f"pathep-[{name}]",
+                                                  name=name, lagT='node'))
+    for pod, node in nodes:
+        node_dn = fabric.add(f"topology/pod-{pod}", 'fabricNode', f"node-{node}", id=str(node), name=f"leaf{node}",
+                             role='leaf', fabricSt='active')
+        sys_dn = fabric.add(node_dn, 'topSystem', 'sys', id=str(node), name=f"leaf{node}", role='leaf')
+        for port in range(1, ports + 1):
+            phys_dn = fabric.add(sys_dn, 'l1PhysIf', f"phys-[eth1/{port}]", id=f"eth1/{port}", adminSt='up')
+            fabric.add(phys_dn, 'ethpmPhysIf', 'phys', operSt='down' if rng.random() < down_ratio else 'up')
+        paths_dn = fabric.add(f"topology/pod-{pod}", 'fabricPathEpCont', f"paths-{node}", nodeId=str(node))
+        for port in range(1, ports + 1):
+            fabric.add(paths_dn, 'fabricPathEp', f"pathep-[eth1/{port}]", name=f"eth1/{port}", lagT='not-aggregated')
+
+        profile_dn = fabric.add('uni/infra', 'infraAccPortP', f"accportprof-Leaf{node}_IntProf",
+                                name=f"Leaf{node}_IntProf")
+        for port in range(1, ports + 1):
+            selector_dn = fabric.add(profile_dn, 'infraHPortS', f"hports-Port{port}-typ-range",
+                                     name=f"Port{port}", type='range')
+            fabric.add(selector_dn, 'infraPortBlk', 'portblk-block1', name='block1', fromCard='1', toCard='1',
+                       fromPort=str(port), toPort=str(port))
+            policy_group = (f"accbundle-{vpcs[node][0]}" if node in vpcs and port == ports
+                            else f"accportgrp-PG_Port{port}")
+            fabric.add(selector_dn, 'infraRsAccBaseGrp', 'rsaccBaseGrp', tDn=f"uni/infra/funcprof/{policy_group}")
+
+        switch_dn = fabric.add('uni/infra', 'infraNodeP', f"nprof-Leaf{node}_SwProf", name=f"Leaf{node}_SwProf")
+        leaf_dn = fabric.add(switch_dn, 'infraLeafS', 'leaves-Leaf-typ-range', name='Leaf', type='range')
+        fabric.add(leaf_dn, 'infraNodeBlk', 'nodeblk-block1', name='block1', from_=str(node), to_=str(node))
+        fabric.add(switch_dn, 'infraRsAccPortP', f"rsaccPortP-[{profile_dn}]", tDn=profile_dn)
+
+    for i in range(epgs):
+        tenant = MOCK_TENANTS[i % len(MOCK_TENANTS)]
+        epg_dn = fabric.add(f"uni/tn-{tenant}/ap-App{i % 50}", 'fvAEPg', f"epg-EPG{i}", name=f"EPG{i}")
+        fabric.add(epg_dn, 'fvRsDomAtt', f"rsdomAtt-[{MOCK_VMM_DOMAIN}]", tDn=MOCK_VMM_DOMAIN)
+        for _ in range(bindings_per_epg):
+            pod, node = rng.choice(nodes)
+            if node in vpcs and rng.random() < VPC_BINDING_RATIO:
+                path = vpcs[node][1]
+            else:
+                path = f"topology/pod-{pod}/paths-{node}/pathep-[eth1/{rng.randint(1, ports - (node in vpcs))}]"
+            fabric.add(epg_dn, 'fvRsPathAtt', f"rspathAtt-[{path}]", tDn=path, encap=f"vlan-{100 + i % 3900}")
+    return fabric
+
+
+# --- query-target-filter ---
+
+FILTER_TOKEN_RE = re.compile(r'\s*(?:(?P<op>[a-z]+)\(|(?P<prop>\w+\.\w+)|"(?P<value>[^"]*)"|(?P<sep>[,)]))')
+
+
+def parse_filter(text):
+    # eq/ne/wcard/and/or/not expressions -> predicate(dn, attrs)
+    tokens = [m for m in FILTER_TOKEN_RE.finditer(text) if m.group().strip()]
+    position = 0
+
+    def expression():
+        nonlocal position
+        op = tokens[position].group('op')
+        position += 1
+        args = []
+        while tokens[position].group('sep') != ')':
+            if tokens[position].group('sep') == ',':
+                position += 1
+            elif tokens[position].group('op'):
+                args.append(expression())
+            else:
+                token = tokens[position]
+                args.append(('prop', token.group('prop').split('.')[1]) if token.group('prop')
+                            else ('value', token.group('value')))
+                position += 1
+        position += 1
+        return op, args
+
+    return compile_filter(expression())
+
+
+def compile_filter(node):
+    op, args = node
+    if op in ('and', 'or', 'not'):
+        parts = [compile_filter(arg) for arg in args]
+        if op == 'and':
+            return lambda dn, attrs: all(p(dn, attrs) for p in parts)
+        if op == 'or':
+            return lambda dn, attrs: any(p(dn, attrs) for p in parts)
+        return lambda dn, attrs: not parts[0](dn, attrs)
+    (_, prop), (_, value) = args
+    get = (lambda dn, attrs: dn) if prop == 'dn' else (lambda dn, attrs: attrs.get(prop, ''))
+    if op == 'eq':
+        return lambda dn, attrs: get(dn, attrs) == value
+    if op == 'ne':
+        return lambda dn, attrs: get(dn, attrs) != value
+    if op == 'wcard':
+        return lambda dn, attrs: value in get(dn, attrs)
+    raise ValueError(f"unsupported filter operator {op}")
+
+
+# --- Encoding ---
+
+def render(fabric, dn, fmt, depth, keep, top=True):
+    # Top-level objects carry their dn, subtree children only their rn, as on APIC
+    class_name, attrs = fabric.mos[dn]
+    props = dict(attrs)
+    if top:
+        props['dn'] = dn
+    else:
+        props['rn'] = dn[len(fabric.parent[dn]) + 1:]
+    children = []
+    if depth:
+        children = [render(fabric, child, fmt, depth - 1, keep, False)
+                    for child in fabric.children.get(dn, ()) if keep(child)]
+    if fmt == 'json':
+        body = {'attributes': props}
+        if children:
+            body['children'] = children
+        return {class_name: body}
+    attr_text = "".join(f" {name}={quoteattr(value)}" for name, value in props.items())
+    if not children:
+        return f"<{class_name}{attr_text}/>"
+    return f"<{class_name}{attr_text}>{''.join(children)}</{class_name}>"
+
+
+def envelope(items, total, fmt):
+    if fmt == 'json':
+        return json.dumps({'totalCount': str(total), 'imdata': items}).encode()
+    return f'<?xml version="1.0" encoding="UTF-8"?><imdata totalCount="{total}">{"".join(items)}</imdata>'.encode()
+
+
+def commit_targets(body, fmt, root_dn):
+    # (dn, status) of every element of a commit body
+    def walk_xml(element, parent_dn):
+        dn = element.get('dn') or child_dn(parent_dn, element.tag, element.attrib)
+        yield dn, element.get('status', '')
+        for child in element:
+            yield from walk_xml(child, dn)
+
+    def walk_json(item, parent_dn):
+        for class_name, mo_body in item.items():
+            attrs = mo_body.get('attributes', {})
+            dn = attrs.get('dn') or child_dn(parent_dn, class_name, attrs)
+            yield dn, attrs.get('status', '')
+            for child in mo_body.get('children', ()):
+                yield from walk_json(child, dn)
+
+    if fmt == 'json':
+        return list(walk_json(json.loads(body), None)) if body.strip() else []
+    return list(walk_xml(ET.fromstring(body), None)) if body.strip() else []
+
+
+def child_dn(parent_dn, class_name, attrs):
+    rn = attrs.get('rn') or RN_FORMATS.get(class_name, '').format(**attrs)
+    if not parent_dn:
+        return rn
+    return f"{parent_dn}/{rn}"
+
+
+class MockApicHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body, content_type, headers=()):
+        server = self.server
+        with server.stats_lock:
+            server.stats['bytes_out'] += len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, text, fmt):
+        if fmt == 'json':
+            body = json.dumps({'totalCount': '1', 'imdata': [{'error': {'attributes': {'code': str(status), 'text': text}}}]})
+        else:
+            body = f'<?xml version="1.0" encoding="UTF-8"?><imdata totalCount="1"><error code="{status}" text={quoteattr(text)}/></imdata>'
+        self._reply(status, body.encode(), f"application/{fmt}")
+
+    def _count(self, kind, body_size):
+        server = self.server
+        with server.stats_lock:
+            server.stats['requests'] += 1
+            server.stats[kind] += 1
+            server.stats['bytes_in'] += body_size + len(self.requestline) + 2
+
+    def _route(self, method):
+        server = self.server
+        parts = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode() if method == 'POST' else ''
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = unquote(parts.path)
+
+        if path == '/mock/stats.json':
+            with server.stats_lock:
+                stats = dict(server.stats)
+            return self._reply(200, json.dumps(stats).encode(), 'application/json')
+        if path == '/mock/reset':
+            with server.stats_lock:
+                server.stats.clear()
+            return self._reply(200, b'{}', 'application/json')
+
+        match = re.match(r'/api/(.+)\.(xml|json)$', path)
+        if not match:
+            return self._reply(404, b'', 'text/plain')
+        target, fmt = match.groups()
+        if server.latency:
+            time.sleep(server.latency)
+
+        if target in ('aaaLogin', 'aaaRefresh'):
+            self._count('login', len(body))
+            return self._login(fmt)
+        if target == 'aaaLogout':
+            self._count('logout', len(body))
+            return self._reply(200, envelope([], 0, fmt), f"application/{fmt}")
+        if self.headers.get('Cookie', '').find('APIC-cookie=') < 0:
+            self._count('unauthorized', len(body))
+            return self._error(403, 'Token was invalid (Error: Token timeout)', fmt)
+
+        if method == 'POST' and target.startswith('mo/'):
+            self._count('commit', len(body))
+            return self._commit(target[3:], body, fmt)
+        if target.startswith('class/'):
+            self._count('class_query', len(body))
+            return self._class_query(target[6:], params, fmt)
+        if target.startswith('mo/'):
+            self._count('dn_query', len(body))
+            return self._dn_query(target[3:], params, fmt)
+        if target == 'subscriptionRefresh':
+            self._count('subscription', len(body))
+            return self._reply(200, envelope([], 0, fmt), f"application/{fmt}")
+        self._count('unknown', len(body))
+        return self._error(400, f"unsupported request {target}", fmt)
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def _login(self, fmt):
+        token = uuid.uuid4().hex
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        attrs = {'token': token, 'refreshTimeoutSeconds': str(TOKEN_TIMEOUT), 'maximumLifetimeSeconds': '86400',
+                 'guiIdleTimeoutSeconds': '1200', 'restTimeoutSeconds': '90', 'creationTime': str(int(time.time())),
+                 'firstLoginTime': str(int(time.time())), 'userName': 'admin', 'remoteUser': 'false',
+                 'unixUserId': '15374', 'sessionId': token[:24], 'lastName': '', 'firstName': '',
+                 'version': '5.2(7f)', 'buildTime': now, 'node': 'topology/pod-1/node-1'}
+        if fmt == 'json':
+            items = [{'aaaLogin': {'attributes': attrs}}]
+        else:
+            items = ["<aaaLogin" + "".join(f" {k}={quoteattr(v)}" for k, v in attrs.items()) + "/>"]
+        self._reply(200, envelope(items, 1, fmt), f"application/{fmt}",
+                    [('Set-Cookie', f"APIC-cookie={token}; path=/; HttpOnly")])
+
+    def _subtree_keep(self, params):
+        classes = set(filter(None, params.get('rsp-subtree-class', '').split(',')))
+        fabric = self.server.fabric
+        if not classes:
+            return lambda dn: True
+
+        def keep(dn):
+            return fabric.mos[dn][0] in classes or any(keep(child) for child in fabric.children.get(dn, ()))
+        return keep
+
+    def _select(self, dns, params, fmt):
+        fabric = self.server.fabric
+        depth = {'full': 99, 'children': 1}.get(params.get('rsp-subtree'), 0)
+        if 'query-target-filter' in params:
+            predicate = parse_filter(params['query-target-filter'])
+            dns = [dn for dn in dns if predicate(dn, fabric.mos[dn][1])]
+        total = len(dns)
+        if 'order-by' in params:
+            dns.sort()  # only <class>.dn is ever asked for
+        if 'page-size' in params:
+            size = int(params['page-size'])
+            start = int(params.get('page', 0)) * size
+            dns = dns[start:start + size]
+        keep = self._subtree_keep(params)
+        items = [render(fabric, dn, fmt, depth, keep) for dn in dns]
+        self._reply(200, envelope(items, total, fmt), f"application/{fmt}")
+
+    def _class_query(self, class_name, params, fmt):
+        fabric = self.server.fabric
+        with fabric.lock:
+            self._select(list(fabric.by_class.get(class_name, ())), params, fmt)
+
+    def _dn_query(self, dn, params, fmt):
+        fabric = self.server.fabric
+        with fabric.lock:
+            if params.get('query-target') == 'subtree':
+                classes = set(filter(None, params.get('target-subtree-class', '').split(',')))
+                dns = ([dn] if dn in fabric.mos else []) + list(fabric.descendants(dn))
+                dns = [d for d in dns if not classes or fabric.mos[d][0] in classes]
+            else:
+                dns = [dn] if dn in fabric.mos else []
+            self._select(dns, params, fmt)
+
+    def _commit(self, root_dn, body, fmt):
+        fabric = self.server.fabric
+        try:
+            targets = commit_targets(body, fmt, root_dn)
+        except (ET.ParseError, ValueError, KeyError) as error:
+            return self._error(400, f"cannot parse commit body: {error}", fmt)
+        with fabric.lock:
+            deleted = sum(fabric.delete(dn) for dn, status in targets if 'deleted' in status)
+        with self.server.stats_lock:
+            self.server.stats['deleted_mos'] += deleted
+        self._reply(200, envelope([], 0, fmt), f"application/{fmt}")
+
+
+class MockApic(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fabric, latency=0.0):
+        super().__init__(address, MockApicHandler)
+        self.fabric = fabric
+        self.latency = latency
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic ACI fabric over a local APIC-like REST API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=MOCK_PORT)
+    parser.add_argument('--leaves', type=int, default=20, help="leaf switches (default: 20)")
+    parser.add_argument('--ports', type=int, default=48, help="access ports per leaf (default: 48)")
+    parser.add_argument('--epgs', type=int, default=500, help="EPGs across the mock tenants (default: 500)")
+    parser.add_argument('--bindings-per-epg', type=int, default=4, help="static path bindings per EPG (default: 4)")
+    parser.add_argument('--pods', type=int, default=1, help="pods the leaves are spread over (default: 1)")
+    parser.add_argument('--down-ratio', type=float, default=0.3, help="share of ports that are down (default: 0.3)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every API request (default: 0)")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.time()
+    fabric = synthetic_fabric(args.leaves, args.ports, args.epgs, args.bindings_per_epg, args.pods,
+                              args.down_ratio, args.seed)
+    server = MockApic((args.host, args.port), fabric, args.latency)
+    print(f"Mock APIC with {len(fabric.mos)} objects ({time.time() - started:.1f}s to generate) "
+          f"on http://{args.host}:{args.port}/, latency {args.latency}s", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
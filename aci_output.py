@@ -0,0 +1,88 @@
+import json
+import sys
+import time
+from collections import Counter
+
+# --- SETTINGS ---
+LEVELS = ('summary', 'object', 'xml')
+BUFFER_LINES = 256  # Lines held before writing to the terminal
+PROGRESS_INTERVAL = 2.0  # Seconds between progress lines at summary level
+
+
+class Output:
+    # Buffered, levelled terminal output for the cleanup scripts:
+    #   summary - totals plus a rate-limited progress line
+    #   object  - one line per evaluated object (the old default)
+    #   xml     - object lines plus the XML that would be posted
+    # XML is only rendered at the xml level. Every object event can also go
+    # to a JSON lines sink regardless of the terminal level.
+
+    def __init__(self, level='summary', jsonl_path=None, stream=None, progress_interval=PROGRESS_INTERVAL):
+        self.level = LEVELS.index(level)
+        self.stream = stream or sys.stdout
+        self.progress_interval = progress_interval
+        self.counts = Counter()
+        self._buffer = []
+        self._last_progress = time.time()
+        self._jsonl = open(jsonl_path, 'w', encoding="utf-8") if jsonl_path else None
+        self._closed = False
+
+    def _emit(self, text):
+        self._buffer.append(text)
+        if len(self._buffer) >= BUFFER_LINES:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self.stream.flush()
+
+    def summary(self, text):
+        self._emit(text)
+        self.flush()
+
+    def detail(self, text):
+        # Context lines (headers, follow-ups) shown from the object level up
+        if self.level >= 1:
+            self._emit(text)
+
+    def object(self, tag, text, dn=None, **fields):
+        self.counts[tag] += 1
+        if self._jsonl:
+            self._jsonl.write(json.dumps(dict(tag=tag, dn=str(dn) if dn is not None else None, **fields)) + "\n")
+        if self.level >= 1:
+            self._emit(text)
+        else:
+            self.progress()
+
+    def xml(self, mo, prefix=""):
+        if self.level >= 2:
+            from cobra.internal.codec.xmlcodec import toXMLStr
+            self._emit(f"{prefix}{toXMLStr(mo)}")
+
+    def progress(self, force=False):
+        now = time.time()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        counters = ", ".join(f"{tag}={count}" for tag, count in sorted(self.counts.items()))
+        self.summary(f"  ... {sum(self.counts.values())} processed ({counters})")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.level == 0 and self.counts:
+            self.progress(force=True)
+        self.flush()
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+def add_output_arguments(parser):
+    parser.add_argument("--output", choices=LEVELS, default='summary',
+                        help="terminal detail: summary (progress counters), object (one line each) "
+                             "or xml (object lines plus XML preview); default: summary")
+    parser.add_argument("--jsonl", metavar="FILE", help="also write every evaluated object to a JSON lines file")
@@ -0,0 +1,81 @@
+from aci_bulk import QuerySpec, class_query
+from aci_dn import parse_dn, parse_interface, path_dn, phys_dn
+
+# --- SETTINGS ---
+BUNDLE_PREFIX = 'accbundle-'  # Policy_Group of a PC/vPC member port in the report
+# Every node with its pod, and only the aggregated paths: a PC path is
+# paths-101/pathep-[PG], a vPC path protpaths-1005-1006/pathep-[PG]. Single
+# ports are not fetched, their paths follow from the node's pod.
+PATH_QUERIES = {
+    'fabricNode': QuerySpec('fabricNode', prop_include='naming-only'),
+    'fabricPathEp': QuerySpec('fabricPathEp', prop_include='naming-only',
+                              target_filter='ne(fabricPathEp.lagT,"not-aggregated")'),
+}
+
+
+class PathIndex:
+    # Resolves the DNs the cleanup scripts build instead of assuming pod 1 and
+    # single ports: node -> pod from fabricNode, and (node, policy group) ->
+    # PC/vPC path from the aggregated fabricPathEps. Both vPC peers map to the
+    # same protpaths DN.
+
+    def __init__(self):
+        self.pods = {}  # node id -> pod id
+        self.bundles = {}  # (node id, policy group name) -> PC/vPC path DN
+
+    def __len__(self):
+        return len(self.pods)
+
+    def add_node(self, node, pod):
+        self.pods[str(node)] = str(pod)
+
+    def add_path(self, dn_str):
+        dn = parse_dn(dn_str)
+        for node in dn.node.split('-'):
+            self.pods.setdefault(node, dn.pod)
+            self.bundles[(node, dn.interface)] = dn_str
+
+    def pod(self, node):
+        return self.pods.get(str(node))
+
+    def bundle(self, node, policy_group):
+        # PC/vPC path of a member port, from the report's Policy_Group column
+        if not policy_group or not policy_group.startswith(BUNDLE_PREFIX):
+            return None
+        return self.bundles.get((str(node), policy_group[len(BUNDLE_PREFIX):]))
+
+    def bundle_paths(self, nodes):
+        # Every PC/vPC path that has a member on one of the nodes
+        nodes = {str(node) for node in nodes}
+        return sorted({dn for (node, _), dn in self.bundles.items() if node in nodes})
+
+    def path(self, node, interface, policy_group=None):
+        # Binding target of a port: its PC/vPC path when it is a bundle
+        # member, otherwise its own path (FEX ports under extpaths-). None
+        # when the node is not in the fabric.
+        bundle = self.bundle(node, policy_group)
+        if bundle:
+            return bundle
+        pod = self.pod(node)
+        if pod is None:
+            return None
+        port = parse_interface(interface)
+        if port and port.fex:
+            return path_dn(pod, f"{node}/extpaths-{port.fex}", f"eth{port.card}/{port.port}")
+        return path_dn(pod, node, interface)
+
+    def phys(self, node, interface):
+        pod = self.pod(node)
+        return phys_dn(pod, node, interface) if pod is not None else None
+
+
+def load_path_index(mo_dir, bundles=True):
+    # One fabricNode query, plus one for the PC/vPC paths unless only pods are needed
+    paths = PathIndex()
+    for mo in mo_dir.query(class_query(PATH_QUERIES['fabricNode'])):
+        dn = parse_dn(str(mo.dn))
+        paths.add_node(dn.node, dn.pod)
+    if bundles:
+        for mo in mo_dir.query(class_query(PATH_QUERIES['fabricPathEp'])):
+            paths.add_path(str(mo.dn))
+    return paths
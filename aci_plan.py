@@ -0,0 +1,108 @@
+import json
+import time
+import uuid
+from collections import defaultdict
+
+from aci_bulk import query_by_dns
+from aci_commit import CommitEngine, format_summary, run_id
+from aci_session import apic_url
+
+
+class PlanWriter:
+    # Dry runs record each DN they would delete as one JSON line, preceded by
+    # a header line. Entries may carry "require_down": ethpmPhysIf DNs that
+    # must still not be up when the plan is applied.
+
+    def __init__(self, plan_path, script, apic=None):
+        self.plan_path = plan_path
+        self.count = 0
+        self._file = open(plan_path, 'w', encoding="utf-8")
+        self._write({'plan': script, 'id': uuid.uuid4().hex, 'apic': apic,
+                     'created': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, separators=(',', ':')) + "\n")
+
+    def add(self, dn, class_name, require_down=None):
+        entry = {'dn': str(dn), 'class': class_name}
+        if require_down:
+            entry['require_down'] = list(require_down)
+        self._write(entry)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_plan(plan_path):
+    # (header, entries); ValueError for a damaged plan, so scripts can reject
+    # it before logging in
+    header = {}
+    entries = []
+    with open(plan_path, encoding="utf-8") as plan_file:
+        for line_number, line in enumerate(plan_file, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'dn' in entry:
+                if 'class' not in entry:
+                    raise ValueError(f"line {line_number} has no class")
+                entries.append(entry)
+            elif 'plan' in entry:
+                header = entry
+    return header, entries
+
+
+def add_plan_arguments(parser, plan_file):
+    parser.add_argument("--plan", default=plan_file, help=f"plan file written by a dry run (default: {plan_file})")
+    parser.add_argument("--apply", metavar="PLAN", help="re-validate and commit a plan from a previous dry run")
+    parser.add_argument("--any-apic", action="store_true",
+                        help="with --apply, allow a plan written against another APIC")
+
+
+def apply_plan(mo_dir, plan_path, journal_path=None, apic=None, any_apic=False):
+    # Re-validate every planned DN with bulk DN-filtered queries (plus the
+    # guarded ports, if any) and commit the ones that still hold. Only an
+    # interrupted apply of this same plan on this APIC is resumed.
+    header, entries = read_plan(plan_path)
+    planned_on = apic_url(header['apic']) if header.get('apic') else None
+    if apic and planned_on != apic and not any_apic:
+        raise ValueError(f"{plan_path} was planned against {planned_on or 'an unknown APIC'}, not {apic}; "
+                         f"pass --any-apic to apply it anyway")
+    print(f"Applying {len(entries)} planned deletion(s) from {plan_path}")
+
+    dns_by_class = defaultdict(list)
+    guard_dns = set()
+    for entry in entries:
+        dns_by_class[entry['class']].append(entry['dn'])
+        guard_dns.update(entry.get('require_down', ()))
+
+    print("Re-validating plan against APIC...")
+    current = {}
+    for class_name, dns in dns_by_class.items():
+        current.update(query_by_dns(mo_dir, class_name, dns))
+    port_state = {}
+    if guard_dns:
+        port_state = {dn: mo.operSt for dn, mo in query_by_dns(mo_dir, 'ethpmPhysIf', guard_dns).items()}
+
+    plan_id = header.get('id') or f"{plan_path}@{header.get('created')}"  # plans written before ids
+    commit_engine = CommitEngine(mo_dir, journal_path, run_id('plan', plan_id), apic)
+    gone = blocked = 0
+    for entry in entries:
+        mo = current.get(entry['dn'])
+        if mo is None:
+            gone += 1
+            print(f"[GONE] {entry['dn']}")
+            continue
+        up_ports = [dn for dn in entry.get('require_down', ()) if port_state.get(dn) == 'up']
+        if up_ports:
+            blocked += 1
+            print(f"[BLOCKED] {entry['dn']} kept, port(s) came UP since the plan: {', '.join(up_ports)}")
+            continue
+        mo.delete()
+        commit_engine.add(mo)
+
+    summary = commit_engine.commit()
+    summary.update(planned=len(entries), gone=gone, blocked=blocked)
+    print(f"\nApply: planned={len(entries)}, gone={gone}, blocked={blocked}, {format_summary(summary)}")
+    return summary
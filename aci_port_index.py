@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from collections import defaultdict
+from typing import NamedTuple
+
+
+class Selector(NamedTuple):
+    name: str
+    policy_group: str
+
+
+class Overlap(NamedTuple):
+    profile: str
+    card: int
+    from_port: int
+    to_port: int
+    selectors: tuple
+
+
+class PortBlockIndex:
+    # Interval index over infraPortBlk ranges, one sorted segment list per
+    # (interface profile, card). Blocks are merged per selector first, then cut
+    # into disjoint segments so a port resolves with a single bisect and every
+    # port is owned by one segment however many selectors cover it. Segments
+    # are rebuilt lazily, only for the (profile, card) keys that changed.
+
+    def __init__(self):
+        self._blocks = defaultdict(list)  # (profile, card) -> [(from, to, selector)]
+        self._segments = {}  # (profile, card) -> (starts, ends, owners)
+        self._cards = defaultdict(set)  # profile -> {card}
+
+    def add(self, profile, selector, from_card, to_card, from_port, to_port):
+        for card in range(int(from_card), int(to_card) + 1):
+            self._blocks[(profile, card)].append((int(from_port), int(to_port), selector))
+            self._cards[profile].add(card)
+            self._segments.pop((profile, card), None)
+
+    def discard(self, profile):
+        # Drop every block of a profile, so it can be re-added after a change
+        for card in self._cards.pop(profile, ()):
+            self._blocks.pop((profile, card), None)
+            self._segments.pop((profile, card), None)
+
+    def profiles(self):
+        return self._cards.keys()
+
+    def __len__(self):
+        return len(self._cards)
+
+    def _build(self):
+        for key in self._blocks:
+            if key not in self._segments:
+                self._build_key(key)
+
+    def _build_key(self, key):
+        blocks = self._blocks[key]
+        # De-duplicate overlapping or adjacent blocks of the same selector
+        merged = defaultdict(list)
+        for from_port, to_port, selector in sorted(blocks, key=lambda b: (b[0], b[1])):
+            ranges = merged[selector]
+            if ranges and from_port <= ranges[-1][1] + 1:
+                ranges[-1][1] = max(ranges[-1][1], to_port)
+            else:
+                ranges.append([from_port, to_port])
+
+        # Sweep the boundaries into disjoint segments, keeping the order
+        # in which selectors were first seen as their precedence.
+        order = {selector: i for i, selector in enumerate(merged)}
+        events = defaultdict(list)
+        for selector, ranges in merged.items():
+            for from_port, to_port in ranges:
+                events[from_port].append((1, selector))
+                events[to_port + 1].append((-1, selector))
+        starts, ends, owners = [], [], []
+        active = set()
+        points = sorted(events)
+        for point, next_point in zip(points, points[1:]):
+            for delta, selector in events[point]:
+                if delta > 0:
+                    active.add(selector)
+                else:
+                    active.discard(selector)
+            if active:
+                starts.append(point)
+                ends.append(next_point - 1)
+                owners.append(tuple(sorted(active, key=order.get)))
+        self._segments[key] = (starts, ends, owners)
+
+    def _segments_for(self, profile, card):
+        key = (profile, card)
+        if key not in self._segments and key in self._blocks:
+            self._build_key(key)
+        return self._segments.get(key)
+
+    def lookup(self, profile, card, port):
+        # Selectors covering (card, port) in this profile, first-defined first
+        segments = self._segments_for(profile, card)
+        if not segments:
+            return ()
+        starts, ends, owners = segments
+        i = bisect_right(starts, port) - 1
+        if i >= 0 and port <= ends[i]:
+            return owners[i]
+        return ()
+
+    def iter_ports(self, profile):
+        # Every configured (card, port) of a profile exactly once, in order
+        for card in sorted(self._cards.get(profile, ())):
+            starts, ends, owners = self._segments_for(profile, card)
+            for from_port, to_port, selectors in zip(starts, ends, owners):
+                for port in range(from_port, to_port + 1):
+                    yield card, port, selectors
+
+    def overlaps(self):
+        self._build()
+        for (profile, card), (starts, ends, owners) in sorted(self._segments.items()):
+            for from_port, to_port, selectors in zip(starts, ends, owners):
+                if len(selectors) > 1:
+                    yield Overlap(profile, card, from_port, to_port, selectors)
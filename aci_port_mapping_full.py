@@ -1,137 +1,409 @@
-import cobra.mit.access
-import cobra.mit.request
-import cobra.mit.session
-import cobra.model.infra
-import cobra.model.fv
 import urllib3
-import getpass
+import argparse
+import time
 import csv
-import re
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from aci_binding_index import BindingIndex
+from aci_bulk import QuerySpec, class_query
+from aci_dn import parse_dn, parse_interface, port_key
+from aci_metrics import Metrics, add_metrics_arguments, start_metrics
+from aci_port_index import PortBlockIndex, Selector
+from aci_rest import RestReader, rest_fetch_rows
+from aci_report_diff import CHANGES_FILE, ReportDiff, format_counts
+from aci_session import apic_url, prompt_credentials, open_session as open_apic_session
+from aci_snapshot import FabricSnapshot, add_snapshot_arguments, open_snapshot
+
+# --- SETTINGS ---
+OUTPUT_FILE = 'aci_port_epg_report.csv'
+QUERY_WORKERS = 4  # Parallel ClassQuery calls against the shared session
+PAGE_SIZE = 5000  # Objects per APIC page when streaming (--stream)
+OVERLAP_FILE = 'aci_port_selector_overlaps.csv'
+REPORT_CLASSES = ['ethpmPhysIf', 'fvRsPathAtt', 'infraAccPortP', 'infraNodeP']
+# Only what the builders read: operSt is operational, so ethpmPhysIf keeps every
+# property; bindings, PC/vPC ones included, are read from the DN alone;
+# profile subtrees are cut down to the classes that are walked.
+REPORT_QUERIES = {
+    'ethpmPhysIf': QuerySpec('ethpmPhysIf'),
+    'fvRsPathAtt': QuerySpec('fvRsPathAtt', prop_include='naming-only'),
+    'infraAccPortP': QuerySpec('infraAccPortP', subtree='full', prop_include='config-only',
+                               subtree_classes=('infraHPortS', 'infraPortBlk', 'infraRsAccBaseGrp')),
+    'infraNodeP': QuerySpec('infraNodeP', subtree='full', prop_include='config-only',
+                            subtree_classes=('infraLeafS', 'infraNodeBlk', 'infraRsAccPortP')),
+}
+REPORT_FIELDS = ['Node', 'Interface', 'Status', 'Deployed_EPGs', 'Interface_Profile', 'Selector', 'Policy_Group', 'Switch_Profile']
 
 # Suppress SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def get_aci_comprehensive_report():
-    # --- Connection Details ---
-    host = input('APIC IP/Hostname: ')
-    URL = f'https://{host}'
-    USER = input('Username: ')
-    PASS = getpass.getpass('Password: ')
-    OUTPUT_FILE = 'aci_port_epg_report.csv'
 
-    lsession = cobra.mit.session.LoginSession(URL, USER, PASS)
-    mo_dir = cobra.mit.access.MoDirectory(lsession)
+def iter_class(mo_dir, spec, page_size=None):
+    # Without a page size the whole class comes back in one response. With one,
+    # pages are requested until APIC returns a short page, so only a single
+    # page of MOs is ever held at a time.
+    started = time.time()
+    count = 0
+    page = 0
+    while True:
+        result = mo_dir.query(class_query(spec, page, page_size))
+        for mo in result:
+            count += 1
+            yield mo
+        if not page_size or len(result) < page_size:
+            break
+        page += 1
+    print(f"  -> {spec.class_name}: {count} objects in {page + 1} page(s), {time.time() - started:.1f}s")
 
-    try:
-        mo_dir.login()
-    except Exception as e:
-        print(f"Login failed: {e}")
-        return
 
-    print("Step 1: Gathering Operational Status (ethpmPhysIf)...")
+def fetch_fabric_state(mo_dir, workers=QUERY_WORKERS, page_size=None):
+    # None of the four queries depends on another, so issue them together
+    # over the already authenticated session and wait for all of them. Each
+    # job folds its MOs into a lookup structure as they arrive.
+    jobs = {
+        'ethpmPhysIf': build_oper_status_map,
+        'fvRsPathAtt': build_epg_binding_map,
+        'infraAccPortP': build_profile_map,
+        'infraNodeP': build_switch_profiles,
+    }
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            class_name: pool.submit(builder, iter_class(mo_dir, REPORT_QUERIES[class_name], page_size))
+            for class_name, builder in jobs.items()
+        }
+        return {class_name: future.result() for class_name, future in futures.items()}
+
+
+def build_oper_status_map(all_statuses):
     oper_status_map = {}
-    status_query = cobra.mit.request.ClassQuery("ethpmPhysIf")
-    all_statuses = mo_dir.query(status_query)
     for stat in all_statuses:
-        dn_str = str(stat.dn)
-        try:
-            node_id = re.search(r'node-(\d+)', dn_str).group(1)
-            port_id = re.search(r'phys-\[eth(.*?/.*?)\]', dn_str).group(1)
-            oper_status_map[f"{node_id}/{port_id}"] = stat.operSt
-        except (AttributeError, IndexError):
+        # DN: topology/pod-1/node-101/sys/phys-[eth1/1]/phys
+        dn = parse_dn(str(stat.dn))
+        if not dn.node or not dn.interface:
             continue
+        oper_status_map[port_key(dn.node, dn.interface)] = stat.operSt
+    return oper_status_map
+
 
-    print("Step 2: Gathering Static EPG Bindings (fvRsPathAtt)...")
-    # Map "node/port" -> List of EPGs ("Tenant/AppProf/EPG")
-    epg_binding_map = {}
-    epg_query = cobra.mit.request.ClassQuery("fvRsPathAtt")
-    all_bindings = mo_dir.query(epg_query)
-    
+def build_epg_binding_map(all_bindings):
+    # Index port -> EPGs ("Tenant/AppProf/EPG") and EPG -> ports
+    bindings = BindingIndex()
     for binding in all_bindings:
         # DN: uni/tn-T1/ap-A1/epg-E1/rspathAtt-[topology/pod-1/paths-101/pathep-[eth1/1]]
-        dn_str = str(binding.dn)
-        t_dn_str = str(binding.tDn) # topology/pod-1/paths-101/pathep-[eth1/1]
-        
-        try:
-            # Extract EPG Info
-            tenant = re.search(r'tn-(.*?)/', dn_str).group(1)
-            app_prof = re.search(r'ap-(.*?)/', dn_str).group(1)
-            epg = re.search(r'epg-(.*?)/', dn_str).group(1)
-            epg_full_name = f"{tenant}/{app_prof}/{epg}"
-            
-            # Extract Node/Port from target DN
-            node_id = re.search(r'paths-(\d+)', t_dn_str).group(1)
-            port_id = re.search(r'pathep-\[eth(.*?/.*?)\]', t_dn_str).group(1)
-            key = f"{node_id}/{port_id}"
-            
-            if key not in epg_binding_map:
-                epg_binding_map[key] = []
-            if epg_full_name not in epg_binding_map[key]:
-                epg_binding_map[key].append(epg_full_name)
-        except (AttributeError, IndexError):
+        # The target DN is embedded in the RN, so one parse yields both sides.
+        # A PC/vPC target (protpaths-1005-1006/pathep-[PG]) is kept by policy group.
+        dn = parse_dn(str(binding.dn))
+        if not dn.epg or not dn.node or not dn.interface:
             continue
+        bindings.add(dn.node, dn.interface, f"{dn.tenant}/{dn.ap}/{dn.epg}")
+    return bindings
 
-    print("Step 3: Gathering Logical Profiles (infraAccPortP)...")
-    prof_map = {}
-    intf_query = cobra.mit.request.ClassQuery("infraAccPortP")
-    intf_query.subtree = 'full'
-    for prof in mo_dir.query(intf_query):
-        selectors = []
+
+def build_profile_map(all_profiles):
+    # Interface profiles become an interval index over their port blocks
+    import cobra.model.infra
+
+    port_index = PortBlockIndex()
+    for prof in all_profiles:
         for child in prof.children:
             if isinstance(child, cobra.model.infra.HPortS):
                 port_blocks = []
                 pg = "None"
                 for gc in child.children:
                     if isinstance(gc, cobra.model.infra.PortBlk):
-                        port_blocks.append((int(gc.fromPort), int(gc.toPort)))
+                        port_blocks.append((gc.fromCard, gc.toCard, gc.fromPort, gc.toPort))
                     if isinstance(gc, cobra.model.infra.RsAccBaseGrp):
                         pg = str(gc.tDn).split('/')[-1]
-                selectors.append({'name': child.name, 'blocks': port_blocks, 'pg': pg})
-        prof_map[prof.name] = selectors
+                selector = Selector(child.name, pg)
+                for from_card, to_card, from_port, to_port in port_blocks:
+                    port_index.add(prof.name, selector, from_card, to_card, from_port, to_port)
+    return port_index
 
-    print("Step 4: Correlating and Exporting...")
-    report_data = []
-    node_query = cobra.mit.request.ClassQuery("infraNodeP")
-    node_query.subtree = 'full'
-    for sp in mo_dir.query(node_query):
-        nodes = []
+
+def build_switch_profiles(all_switch_profiles):
+    # Reduce each infraNodeP subtree to (name, nodes, interface profiles).
+    # Overlapping node blocks collapse into one sorted node list.
+    import cobra.model.infra
+
+    switch_profiles = []
+    for sp in all_switch_profiles:
+        nodes = set()
+        prof_names = []
         for child in sp.children:
             if isinstance(child, cobra.model.infra.LeafS):
                 for gs in child.children:
                     if isinstance(gs, cobra.model.infra.NodeBlk):
-                        for n_id in range(int(gs.from_), int(gs.to_) + 1):
-                            nodes.append(str(n_id))
-        
-        for child in sp.children:
+                        nodes.update(range(int(gs.from_), int(gs.to_) + 1))
             if isinstance(child, cobra.model.infra.RsAccPortP):
-                prof_name = str(child.tDn).split('accportprof-')[-1]
-                for node in nodes:
-                    for s in prof_map.get(prof_name, []):
-                        for block in s['blocks']:
-                            for p_num in range(block[0], block[1] + 1):
-                                port_key = f"{node}/1/{p_num}"
-                                status = oper_status_map.get(port_key, "N/A")
-                                epgs = epg_binding_map.get(port_key, ["None (Unbound)"])
-
-                                report_data.append({
-                                    'Node': node,
-                                    'Interface': f"eth1/{p_num}",
-                                    'Status': status,
-                                    'Deployed_EPGs': " | ".join(epgs),
-                                    'Interface_Profile': prof_name,
-                                    'Selector': s['name'],
-                                    'Policy_Group': s['pg'],
-                                    'Switch_Profile': sp.name
-                                })
-
-    with open(OUTPUT_FILE, mode='w', newline='') as csvfile:
-        fieldnames = ['Node', 'Interface', 'Status', 'Deployed_EPGs', 'Interface_Profile', 'Selector', 'Policy_Group', 'Switch_Profile']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                prof_names.append(parse_dn(str(child.tDn)).profile)
+        switch_profiles.append((sp.name, [str(n_id) for n_id in sorted(nodes)], prof_names))
+    return switch_profiles
+
+
+def report_row(node, card, port, selector, prof_name, sp_name, oper_status_map, bindings):
+    key = f"{node}/{card}/{port}"
+    return {
+        'Node': node,
+        'Interface': f"eth{card}/{port}",
+        'Status': oper_status_map.get(key, "N/A"),
+        'Deployed_EPGs': " | ".join(bindings.epgs(node, card, port, policy_group=selector.policy_group)
+                                    or ["None (Unbound)"]),
+        'Interface_Profile': prof_name,
+        'Selector': selector.name,
+        'Policy_Group': selector.policy_group,
+        'Switch_Profile': sp_name
+    }
+
+
+def correlate(switch_profiles, port_index, oper_status_map, bindings):
+    # Yields report rows one at a time so they can be written as produced.
+    # A port covered by several selectors is emitted once, under the selector
+    # defined first; the overlap itself is reported from port_index.overlaps().
+    for sp_name, nodes, prof_names in switch_profiles:
+        for prof_name in prof_names:
+            for node in nodes:
+                for card, port, selectors in port_index.iter_ports(prof_name):
+                    yield report_row(node, card, port, selectors[0], prof_name, sp_name,
+                                     oper_status_map, bindings)
+
+
+def parse_port_id(port_id):
+    # "101/1/5" or "101/eth1/5" -> (node, Interface); None when malformed
+    node, _, interface = port_id.partition('/')
+    parsed = parse_interface(interface if interface.startswith('eth') else f"eth{interface}")
+    return (node, parsed) if node and parsed else None
+
+
+def check_lookups(args):
+    # Malformed --port and --epg values, reported before anything logs in
+    errors = [f"cannot parse port '{port_id}', expected NODE/CARD/PORT (e.g. 101/1/5)"
+              for port_id in args.ports or () if not parse_port_id(port_id)]
+    errors += [f"cannot parse EPG '{epg}', expected TENANT/AP/EPG"
+               for epg in args.epgs or () if len(epg.split('/')) != 3]
+    return errors
+
+
+def ignored_flags(args):
+    # Flags given on the command line that the chosen mode does not use
+    if args.watch or args.watch_url:
+        given = [('--port', args.ports), ('--epg', args.epgs), ('--diff', args.diff),
+                 ('--stream', args.stream), ('--rest', args.rest)]
+        return [f"{flag} is not used with --watch" for flag, value in given if value]
+    warnings = []
+    if args.stream and (args.rest or args.snapshot):
+        warnings.append("--stream is ignored with --rest and --snapshot, which read whole classes")
+    elif args.page_size != PAGE_SIZE and not args.stream:
+        warnings.append("--page-size only applies with --stream")
+    if args.rest_record and not args.rest:
+        warnings.append("--rest-record only applies with --rest")
+    if args.diff and (args.ports or args.epgs):
+        warnings.append("--diff only applies to the full report, not to --port or --epg lookups")
+    elif args.changes != CHANGES_FILE and not args.diff:
+        warnings.append("--changes only applies with --diff")
+    return warnings
+
+
+def lookup_ports(port_ids, switch_profiles, port_index, oper_status_map, bindings):
+    # "By port" mode: resolve node/card/port through the index directly
+    # instead of expanding every profile.
+    profiles_by_node = {}
+    for sp_name, nodes, prof_names in switch_profiles:
+        for node in nodes:
+            profiles_by_node.setdefault(node, []).extend((sp_name, p) for p in prof_names)
+
+    for port_id in port_ids:
+        port = parse_port_id(port_id)
+        if not port:
+            print(f"[SKIP] Cannot parse port '{port_id}', expected NODE/CARD/PORT (e.g. 101/1/5)")
+            continue
+        node, parsed = port
+        for sp_name, prof_name in profiles_by_node.get(node, []):
+            for selector in port_index.lookup(prof_name, parsed.card, parsed.port):
+                yield report_row(node, parsed.card, parsed.port, selector, prof_name, sp_name,
+                                 oper_status_map, bindings)
+
+
+def write_overlaps(port_index):
+    overlaps = list(port_index.overlaps())
+    if not overlaps:
+        return
+    print(f"[WARNING] {len(overlaps)} port range(s) are claimed by more than one selector; "
+          f"reported once under the first selector, details in {OVERLAP_FILE}")
+    with open(OVERLAP_FILE, mode='w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Interface_Profile', 'Card', 'From_Port', 'To_Port', 'Selectors'])
+        for overlap in overlaps:
+            writer.writerow([overlap.profile, overlap.card, overlap.from_port, overlap.to_port,
+                             " | ".join(s.name for s in overlap.selectors)])
+
+
+def open_session(metrics=None, credentials=None):
+    return open_apic_session(*(credentials or prompt_credentials()), metrics or Metrics('aci_port_mapping_full'))
+
+
+def connect_apic(metrics=None, credentials=None):
+    return open_session(metrics, credentials)[1]
+
+
+def connect_rest(record_dir=None, metrics=None, credentials=None):
+    metrics = metrics or Metrics('aci_port_mapping_full')
+    host, username, password = credentials or prompt_credentials()
+    reader = RestReader(apic_url(host), username, password, record_dir=record_dir, metrics=metrics)
+    with metrics.phase('login'):
+        return reader.login()
+
+
+def get_aci_comprehensive_report(args, metrics):
+    errors = check_lookups(args)
+    if errors:
+        for error in errors:
+            print(f"Error: {error}")
+        sys.exit(1)
+    # Asked for up front in a phase of their own, so typing them is not
+    # booked to the fetch phase; the login itself is booked to 'login'
+    metrics.begin('prompt')
+    credentials = prompt_credentials()
+    sessions = []
+
+    def connect():
+        # Log in on first use only, so a fresh snapshot needs no APIC at all
+        if not sessions:
+            sessions.append(connect_rest(args.rest_record, metrics, credentials) if args.rest
+                            else connect_apic(metrics, credentials))
+        return sessions[0]
+
+    metrics.begin('fetch')
+    try:
+        if args.snapshot or args.rest:
+            # Raw JSON reads land in an in-memory snapshot unless one was asked for
+            fetch = rest_fetch_rows if args.rest else None
+            if args.snapshot:
+                snapshot = open_snapshot(args, apic_url(credentials[0]), REPORT_CLASSES, connect, fetch)
+            else:
+                print(f"Querying {', '.join(REPORT_CLASSES)} over REST ({args.workers} workers)...")
+                snapshot = FabricSnapshot(':memory:')
+                snapshot.sync(connect(), REPORT_CLASSES, args.workers, fetch)
+            fabric = {
+                'ethpmPhysIf': snapshot.oper_status_map(),
+                'fvRsPathAtt': snapshot.epg_binding_map(),
+                'infraAccPortP': snapshot.port_index(),
+                'infraNodeP': snapshot.switch_profiles(),
+            }
+            snapshot.close()
+        else:
+            mo_dir = connect()
+            page_size = args.page_size if args.stream else None
+            mode = f"streaming, {page_size} per page" if page_size else "single response"
+            print(f"Querying ethpmPhysIf, fvRsPathAtt, infraAccPortP and infraNodeP ({args.workers} workers, {mode})...")
+            started = time.time()
+            fabric = fetch_fabric_state(mo_dir, args.workers, page_size)
+            print(f"All queries complete in {time.time() - started:.1f}s")
+    except Exception as e:
+        print(f"{'Query' if sessions else 'Login'} failed: {e}")
+        for mo_dir in sessions:
+            mo_dir.logout()
+        sys.exit(1)
+    metrics.begin('logout')
+    for mo_dir in sessions:
+        mo_dir.logout()
+
+    # Steps 1-3 were folded into lookup maps while the pages arrived
+    print(f"Step 1: Operational Status (ethpmPhysIf): {len(fabric['ethpmPhysIf'])} ports")
+    print(f"Step 2: Static EPG Bindings (fvRsPathAtt): {len(fabric['fvRsPathAtt'])} bound ports, "
+          f"{fabric['fvRsPathAtt'].epg_count()} EPGs")
+    print(f"Step 3: Logical Profiles (infraAccPortP): {len(fabric['infraAccPortP'])} profiles")
+    metrics.begin('correlate')
+
+    if args.epgs:
+        print("Step 4: Looking up ports carrying the requested EPGs...")
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['EPG', 'Node', 'Interface'])
+        for epg_name in args.epgs:
+            writer.writerows([epg_name, node, interface] for node, interface in fabric['fvRsPathAtt'].ports(epg_name))
+        return
+
+    if args.ports:
+        print("Step 4: Looking up requested ports...")
+        rows = lookup_ports(args.ports, fabric['infraNodeP'], fabric['infraAccPortP'],
+                            fabric['ethpmPhysIf'], fabric['fvRsPathAtt'])
+        writer = csv.DictWriter(sys.stdout, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+
+    print("Step 4: Correlating and Exporting...")
+    rows = correlate(fabric['infraNodeP'], fabric['infraAccPortP'], fabric['ethpmPhysIf'], fabric['fvRsPathAtt'])
+
+    diff = None
+    if args.diff:
+        if os.path.exists(args.diff):
+            diff = ReportDiff(args.diff, REPORT_FIELDS, args.changes)
+        else:
+            print(f"[WARNING] Previous report {args.diff} not found, writing a full report without a change log")
+
+    # Written beside the report and renamed over it, so --diff can still read
+    # the previous report when it is the same file
+    row_count = 0
+    tmp_path = f"{OUTPUT_FILE}.tmp"
+    with open(tmp_path, mode='w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=REPORT_FIELDS)
         writer.writeheader()
-        writer.writerows(report_data)
+        for row in rows:
+            writer.writerow(row)
+            if diff:
+                diff.add(row)
+            row_count += 1
+    if diff:
+        counts = diff.finish()
+        print(f"Changes since {args.diff}: {format_counts(counts)} -> {args.changes}")
+    os.replace(tmp_path, OUTPUT_FILE)
+
+    metrics.begin('overlaps')
+    write_overlaps(fabric['infraAccPortP'])
+    print(f"Success! Comprehensive report ({row_count} rows) exported to {OUTPUT_FILE}")
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Export an ACI port / EPG / selector report to CSV.")
+    parser.add_argument('--workers', type=int, default=QUERY_WORKERS,
+                        help=f"number of fabric queries to run in parallel (default: {QUERY_WORKERS})")
+    parser.add_argument('--stream', action='store_true',
+                        help="fetch classes page by page and fold them into the lookup maps as they arrive")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help=f"objects per APIC page in --stream mode (default: {PAGE_SIZE})")
+    parser.add_argument('--rest', action='store_true',
+                        help="read classes as raw JSON over REST instead of building cobra objects (read-only)")
+    parser.add_argument('--rest-record', metavar='DIR',
+                        help="with --rest, also save every response body to DIR for bench_aci_rest.py")
+    lookup = parser.add_mutually_exclusive_group()
+    lookup.add_argument('--port', dest='ports', action='append', metavar='NODE/CARD/PORT',
+                        help="look up individual ports (e.g. 101/1/5) instead of exporting the full report; repeatable")
+    lookup.add_argument('--epg', dest='epgs', action='append', metavar='TENANT/AP/EPG',
+                        help="list the ports statically bound to an EPG instead of exporting the report; repeatable")
+    parser.add_argument('--diff', nargs='?', const=OUTPUT_FILE, metavar='PREVIOUS_CSV',
+                        help=f"log added, removed and modified rows against a previous report "
+                             f"(default: the existing {OUTPUT_FILE})")
+    parser.add_argument('--changes', default=CHANGES_FILE,
+                        help=f"change log written by --diff, one JSON line per change (default: {CHANGES_FILE})")
+    parser.add_argument('--watch', action='store_true',
+                        help="after the baseline, keep the report current from APIC event subscriptions")
+    parser.add_argument('--watch-url', metavar='WS_URL',
+                        help="read events from this websocket instead of subscribing on APIC "
+                             "(e.g. a recording replayed by aci_websocket.py); implies --watch")
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
+
+
+def run(args):
+    for warning in ignored_flags(args):
+        print(f"[WARNING] {warning}")
+    if args.watch or args.watch_url:
+        from aci_watch import watch_report
+        watch_report(args)
+    else:
+        get_aci_comprehensive_report(args, start_metrics('aci_port_mapping_full', args))
 
-    print(f"Success! Comprehensive report exported to {OUTPUT_FILE}")
-    mo_dir.logout()
 
 if __name__ == "__main__":
-    get_aci_comprehensive_report()
+    run(build_parser().parse_args())
@@ -1,109 +1,265 @@
-import cobra.mit.access
-import cobra.mit.request
-import cobra.mit.session
-import cobra.model.fv
 import urllib3
-from cobra.internal.codec.xmlcodec import toXMLStr
-import getpass
+import argparse
 import csv
 import os
+import sys
+from collections import defaultdict
+
+from aci_bulk import FILTER_MAX_BYTES, encoded_size, filter_chunks, query_dn_set
+from aci_commit import CommitEngine, file_digest, format_summary, run_id
+from aci_dn import epg_dn, path_att_dn
+from aci_metrics import add_metrics_arguments, start_metrics
+from aci_output import Output, add_output_arguments
+from aci_paths import load_path_index
+from aci_plan import PlanWriter, add_plan_arguments, apply_plan, read_plan
+from aci_session import apic_url, login, prompt_credentials
+from aci_snapshot import add_snapshot_arguments, open_snapshot
 
 # --- SETTINGS ---
 INPUT_FILE = 'aci_port_epg_report.csv'
+INPUT_COLUMNS = ('Node', 'Interface', 'Status', 'Deployed_EPGs')
 DRY_RUN = True  # SET TO False TO ACTUALLY DELETE
-POD_ID = '1'
+FILTER_BY_NODE = True  # Only pull bindings on the leaves named in the CSV
+JOURNAL_FILE = 'epg_remove_path_journal.jsonl'  # Append-only log of committed DNs and run summaries
+PLAN_FILE = 'epg_remove_path_plan.jsonl'  # Written by dry runs, consumed by --apply
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def remove_epg_paths_multi():
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: {INPUT_FILE} not found.")
-        return
-
-    host = input('APIC IP/Hostname: ')
-    user = input('Username: ')
-    password = getpass.getpass('Password: ')
-    
-    lsession = cobra.mit.session.LoginSession(f'https://{host}', user, password)
-    mo_dir = cobra.mit.access.MoDirectory(lsession)
-    try:
-        mo_dir.login()
-    except Exception as e:
-        print(f"Login failed: {e}")
-        return
-
-    config_request = cobra.mit.request.ConfigRequest()
-    match_count = 0
-
-    with open(INPUT_FILE, mode='r') as csvfile:
+def parse_candidates(input_file):
+    # Returns [(node, interface, status, policy_group, [(full_epg_path, tenant, app_prof, epg_name), ...]), ...]
+    # for every port that is NOT 'up' and has EPGs assigned, and the
+    # {(node, policy_group)} of PC/vPC member ports that ARE up
+    candidates = []
+    up_members = set()
+    with open(input_file, mode='r') as csvfile:
         reader = csv.DictReader(csvfile)
+        missing = [column for column in INPUT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{input_file} is missing column(s) {', '.join(missing)}; expected a port report CSV")
         for row in reader:
             node = row['Node']
             interface = row['Interface']
             status = row['Status']
             epg_string = row['Deployed_EPGs']
+            policy_group = row.get('Policy_Group', '')
+
+            if status == 'up':
+                up_members.add((node, policy_group))
+                continue
+            if epg_string == 'None (Unbound)':
+                continue
+
+            # Split EPGs by "|"
+            epgs = []
+            for full_epg_path in (e.strip() for e in epg_string.split('|')):
+                parts = full_epg_path.split('/')
+                if len(parts) != 3:
+                    print(f" [SKIP] Malformed EPG path on {node}/{interface}: {full_epg_path}")
+                    continue
+                epgs.append((full_epg_path, *parts))
+            candidates.append((node, interface, status, policy_group, epgs))
+    return candidates, up_members
+
+
+def query_existing_bindings(mo_dir, tenants, nodes=None, paths=None, max_bytes=FILTER_MAX_BYTES):
+    # fvRsPathAtt class queries per tenant, optionally narrowed to the
+    # referenced leaves and the PC/vPC paths they are members of, collected
+    # into a set of binding DNs. Like query_by_dns, the node/path terms are
+    # split so each filter stays under max_bytes URL-encoded.
+    terms = []
+    if nodes:
+        terms = [f'wcard(fvRsPathAtt.tDn,"/paths-{node}/")' for node in sorted(nodes)]
+        if paths:
+            terms += [f'eq(fvRsPathAtt.tDn,"{path}")' for path in paths.bundle_paths(nodes)]
+
+    existing = set()
+    for tenant in sorted(tenants):
+        tenant_filter = f'wcard(fvRsPathAtt.dn,"uni/tn-{tenant}/")'
+        if not terms:
+            existing |= query_dn_set(mo_dir, 'fvRsPathAtt', tenant_filter)
+            continue
+        budget = max_bytes - encoded_size(f"and({tenant_filter},)")
+        for node_filter in filter_chunks(terms, budget):
+            existing |= query_dn_set(mo_dir, 'fvRsPathAtt', f"and({tenant_filter},{node_filter})")
+    return existing
+
+
+def remove_epg_paths_multi(args, metrics):
+    candidates, up_members = [], set()
+    if args.apply:
+        try:
+            read_plan(args.apply)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read plan {args.apply}: {e}")
+            sys.exit(1)
+    else:
+        if not os.path.exists(INPUT_FILE):
+            print(f"Error: {INPUT_FILE} not found.")
+            sys.exit(1)
+
+        try:
+            candidates, up_members = parse_candidates(INPUT_FILE)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    host, user, password = prompt_credentials()
+
+    # A fresh snapshot answers the dry-run existence checks without logging in
+    use_snapshot = args.snapshot and DRY_RUN and not args.apply
+    if args.snapshot and not use_snapshot:
+        print("Note: --snapshot only applies to dry runs; bindings are checked against live APIC state.")
+    sessions = []
+
+    def connect():
+        if not sessions:
+            sessions.append(login(host, user, password, metrics))
+        return sessions[0]
 
-            # Only process if port is NOT 'up' and has EPGs assigned
-            if status != 'up' and epg_string != 'None (Unbound)':
-                
-                # Split EPGs by "|"
-                epg_list = [e.strip() for e in epg_string.split('|')]
-                
-                print(f"\nProcessing Interface {node}/{interface} (Status: {status})")
-                
-                for full_epg_path in epg_list:
-                    try:
-                        # 1. Split the path FIRST
-                        parts = full_epg_path.split('/')
-                        if len(parts) != 3:
-                            print(f" [SKIP] Malformed EPG path: {full_epg_path}")
-                            continue
-                        
-                        tenant, app_prof, epg_name = parts
-
-                        # 2. Build the DNs SECOND
-                        epg_dn = f"uni/tn-{tenant}/ap-{app_prof}/epg-{epg_name}"
-                        path_tdn = f"topology/pod-{POD_ID}/paths-{node}/pathep-[{interface}]"
-                        binding_dn = f"{epg_dn}/rspathAtt-[{path_tdn}]"
-
-                        # 3. Look up the binding THIRD
-                        binding_mo = mo_dir.lookupByDn(binding_dn)
-                        
-                        if binding_mo:
-                            match_count += 1
-                            # Mark for deletion
-                            binding_mo.delete()
-                            
-                            # Show the XML that would be sent
-                            print(f" [DN PATH] {binding_mo.dn}")
-                            print(f" [XML PREVIEW] {toXMLStr(binding_mo)}")
-                            
-                            if not DRY_RUN:
-                                config_request.addMo(binding_mo)
-                                print(f" [QUEUED] {full_epg_path}")
-                            else:
-                                print(f" [DRY RUN] Identified for deletion: {full_epg_path}")
-                        else:
-                            print(f" [NOT FOUND] Binding already gone for: {full_epg_path}")
-
-                    except Exception as e:
-                        print(f" [ERROR] Unexpected error processing {full_epg_path}: {e}")
+    if not use_snapshot:
+        try:
+            connect()
+        except Exception as e:
+            print(f"Login failed: {e}")
+            sys.exit(1)
+
+    if args.apply:
+        metrics.begin('apply')
+        try:
+            summary = apply_plan(connect(), args.apply, JOURNAL_FILE, apic_url(host), args.any_apic)
+        except Exception as e:
+            print(f"ERROR: Apply failed: {e}")
+            summary = {'failed': True}
+        connect().logout()
+        if summary['failed']:
+            sys.exit(1)
+        return
+
+    journal_run = run_id('aci_remove_multi_epg_from_csv', file_digest(INPUT_FILE))
+    commit_engine = CommitEngine(connect(), JOURNAL_FILE, journal_run, apic_url(host)) if not DRY_RUN else None
+    plan = PlanWriter(args.plan, "aci_remove_multi_epg_from_csv", host) if DRY_RUN else None
+    out = Output(args.output, args.jsonl)
+    match_count = 0
+
+    tenants = {tenant for *_, epgs in candidates for _, tenant, _, _ in epgs}
+    nodes = {node for node, *_ in candidates} if FILTER_BY_NODE else None
+    metrics.begin('prefetch')
+    try:
+        if use_snapshot:
+            snapshot = open_snapshot(args, apic_url(host), ['fvRsPathAtt', 'fabricNode', 'fabricPathEp'], connect)
+            paths = snapshot.path_index()
+            existing = snapshot.path_att_dns(tenants)
+            snapshot.close()
+        else:
+            paths = load_path_index(connect())
+            existing = query_existing_bindings(connect(), tenants, nodes, paths)
+    except Exception as e:
+        print(f"ERROR: fabricNode/fabricPathEp/fvRsPathAtt query failed: {e}")
+        for mo_dir in sessions:
+            mo_dir.logout()
+        sys.exit(1)
+    print(f"Loaded {len(existing)} existing static path binding(s) for {len(tenants)} tenant(s), "
+          f"{len(paths)} node(s) and {len(set(paths.bundles.values()))} PC/vPC path(s).")
+
+    # A PC/vPC binding serves every member port: it is kept while any member
+    # listed in the report is up, and its plan entry guards all the others.
+    # A single-port binding's plan entry guards its own port.
+    bundle_members = defaultdict(list)
+    for node, interface, _, policy_group, _ in candidates:
+        bundle = paths.bundle(node, policy_group)
+        if bundle:
+            bundle_members[bundle].append(paths.phys(node, interface))
+    busy_bundles = {paths.bundle(node, policy_group) for node, policy_group in up_members} - {None}
+    handled = set()
+
+    metrics.begin('match')
+    from cobra.model.fv import RsPathAtt
+
+    for node, interface, status, policy_group, epgs in candidates:
+        out.detail(f"\nProcessing Interface {node}/{interface} (Status: {status})")
+        path_tdn = paths.path(node, interface, policy_group)
+        if path_tdn is None:
+            out.object("UNKNOWN NODE", f" [UNKNOWN NODE] Node {node} is not in the fabric, skipping {interface}",
+                       node=node, interface=interface)
+            continue
+        if path_tdn in busy_bundles:
+            out.object("BUNDLE UP", f" [BUNDLE UP] {path_tdn} kept, another member port is up",
+                       dn=path_tdn, interface=f"{node}/{interface}")
+            continue
+
+        for full_epg_path, tenant, app_prof, epg_name in epgs:
+            try:
+                binding_dn = path_att_dn(tenant, app_prof, epg_name, path_tdn)
+                if binding_dn in handled:
+                    continue  # a PC/vPC binding already seen through another member port
+                handled.add(binding_dn)
+
+                if binding_dn in existing:
+                    match_count += 1
+                    # Build the MO locally and mark it for deletion
+                    binding_mo = RsPathAtt(epg_dn(tenant, app_prof, epg_name), tDn=path_tdn)
+                    binding_mo.delete()
+
+                    # Show the XML that would be sent
+                    out.object("MATCH", f" [DN PATH] {binding_dn}", dn=binding_dn, epg=full_epg_path)
+                    out.xml(binding_mo, " [XML PREVIEW] ")
+
+                    if not DRY_RUN:
+                        commit_engine.add(binding_mo)
+                        out.detail(f" [QUEUED] {full_epg_path}")
+                    else:
+                        plan.add(binding_dn, "fvRsPathAtt", bundle_members.get(path_tdn) or [paths.phys(node, interface)])
+                        out.detail(f" [DRY RUN] Identified for deletion: {full_epg_path}")
+                else:
+                    out.object("NOT FOUND", f" [NOT FOUND] Binding already gone for: {full_epg_path}",
+                               dn=binding_dn, epg=full_epg_path)
+
+            except Exception as e:
+                out.object("ERROR", f" [ERROR] Unexpected error processing {full_epg_path}: {e}", epg=full_epg_path)
+
+    out.close()
 
     # Final Commit Section
+    metrics.begin('commit')
+    failed = False
     if match_count > 0:
         if not DRY_RUN:
             try:
                 print(f"\nCommitting {match_count} changes to APIC...")
-                mo_dir.commit(config_request)
-                print(f"SUCCESS: Changes applied.")
+                summary = commit_engine.commit()
+                if summary['failed']:
+                    failed = True
+                    print(f"PARTIAL: {summary['failed']} change(s) failed, re-run to retry them (see {JOURNAL_FILE}).")
+                else:
+                    print(f"SUCCESS: Changes applied.")
+                print(f"Commit: {format_summary(summary)}")
             except Exception as e:
                 print(f"ERROR: Commit failed: {e}")
+                failed = True
         else:
-            print(f"\nDRY RUN COMPLETE: Found {match_count} changes identified above. Set DRY_RUN=False to execute.")
+            print(f"\nDRY RUN COMPLETE: Found {match_count} changes identified above, written to {args.plan}. "
+                  f"Run with --apply {args.plan} to execute.")
     else:
         print("\nNo matching associations found to process.")
 
-    mo_dir.logout()
+    if plan:
+        plan.close()
+    metrics.begin('logout')
+    for mo_dir in sessions:
+        mo_dir.logout()
+    if failed:
+        sys.exit(1)
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description=f"Remove static EPG path bindings from down ports listed in {INPUT_FILE}.")
+    add_plan_arguments(parser, PLAN_FILE)
+    add_output_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
+
+def run(args):
+    remove_epg_paths_multi(args, start_metrics('aci_remove_multi_epg_from_csv', args))
 
 if __name__ == "__main__":
-    remove_epg_paths_multi()
+    run(build_parser().parse_args())
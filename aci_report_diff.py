@@ -0,0 +1,123 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+# --- SETTINGS ---
+CHANGES_FILE = 'aci_port_epg_changes.jsonl'
+KEY_FIELDS = ('Node', 'Interface', 'Interface_Profile', 'Selector', 'Switch_Profile')
+DIGEST_SIZE = 8  # Bytes per fingerprint; collisions are negligible at report sizes
+
+
+def fingerprint(values):
+    return hashlib.blake2b("\x1f".join(values).encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def row_key(row, occurrences):
+    # Key digest of a row. Rows that still share the key fields are
+    # numbered in the order they appear, so each is matched and diffed on
+    # its own instead of being folded into the first.
+    values = [row[f] for f in KEY_FIELDS]
+    base = fingerprint(values)
+    seen = occurrences[base]
+    occurrences[base] += 1
+    return fingerprint(values + [str(seen)]) if seen else base
+
+
+def row_digests(row, fields, occurrences):
+    # (key digest, digest of the remaining fields) for one report row
+    return row_key(row, occurrences), fingerprint([row[f] for f in fields if f not in KEY_FIELDS])
+
+
+class ReportDiff:
+    # Compares freshly produced report rows with a previous report file.
+    # The previous file is reduced to {key digest: row digest}, so only two
+    # small byte strings per row are held, and every new row is checked with
+    # one dict lookup as it is produced. Added rows are logged right away;
+    # modified and removed rows are logged in a second linear pass over the
+    # previous file, which also supplies the old values for per-field diffs.
+
+    def __init__(self, previous_path, fields, changes_path=CHANGES_FILE):
+        self.previous_path = previous_path
+        self.fields = list(fields)
+        self.changes_path = changes_path
+        self.counts = Counter()
+        self._previous = self._index(previous_path)
+        self._current = {}
+        self._occurrences = Counter()
+        self._modified = {}  # key digest -> new row whose fingerprint changed, for the per-field diff
+        self._log = open(changes_path, 'w', encoding="utf-8")
+
+    def _index(self, path):
+        digests = {}
+        occurrences = Counter()
+        with open(path, newline='', encoding="utf-8") as csvfile:
+            for row in csv.DictReader(csvfile):
+                key, digest = row_digests(row, self.fields, occurrences)
+                digests[key] = digest
+        return digests
+
+    def _write(self, change, row, **extra):
+        self.counts[change] += 1
+        entry = {'change': change, **{f: row[f] for f in KEY_FIELDS}, **extra}
+        self._log.write(json.dumps(entry) + "\n")
+
+    def add(self, row):
+        key, digest = row_digests(row, self.fields, self._occurrences)
+        self._current[key] = digest
+        if key not in self._previous:
+            self._write('added', row, values={f: row[f] for f in self.fields if f not in KEY_FIELDS})
+        elif digest != self._previous[key]:
+            self._modified[key] = row
+
+    def finish(self):
+        # Second pass over the previous report: removed rows and field diffs
+        with open(self.previous_path, newline='', encoding="utf-8") as csvfile:
+            occurrences = Counter()
+            for row in csv.DictReader(csvfile):
+                key = row_key(row, occurrences)
+                if key not in self._current:
+                    self._write('removed', row, values={f: row[f] for f in self.fields if f not in KEY_FIELDS})
+                elif self._current[key] != self._previous[key]:
+                    new = self._modified[key]
+                    diffs = {f: [row[f], new[f]] for f in self.fields if f not in KEY_FIELDS and row[f] != new[f]}
+                    self._write('modified', row, fields=diffs)
+                else:
+                    self.counts['unchanged'] += 1
+        self._log.close()
+        return self.counts
+
+
+def format_counts(counts):
+    return (f"added={counts['added']}, removed={counts['removed']}, "
+            f"modified={counts['modified']}, unchanged={counts['unchanged']}")
+
+
+def self_check():
+    # Regression check: python aci_report_diff.py. Port 1008/eth1/1 is listed
+    # under switch profiles 1007-1008 and 1008; only the second row changes.
+    fields = ['Node', 'Interface', 'Status', 'Interface_Profile', 'Selector', 'Switch_Profile']
+    old = [['1008', 'eth1/1', 'up', 'P', 'S', '1007-1008'], ['1008', 'eth1/1', 'up', 'P', 'S', '1008']]
+    new = [['1008', 'eth1/1', 'up', 'P', 'S', '1007-1008'], ['1008', 'eth1/1', 'down', 'P', 'S', '1008']]
+    with tempfile.TemporaryDirectory() as workdir:
+        previous_path, changes_path = os.path.join(workdir, 'old.csv'), os.path.join(workdir, 'changes.jsonl')
+        with open(previous_path, 'w', newline='', encoding="utf-8") as csvfile:
+            csv.writer(csvfile).writerows([fields, *old])
+        diff = ReportDiff(previous_path, fields, changes_path)
+        for values in new:
+            diff.add(dict(zip(fields, values)))
+        counts = diff.finish()
+        with open(changes_path, encoding="utf-8") as changes:
+            entries = [json.loads(line) for line in changes]
+    expected = [{'change': 'modified', 'Node': '1008', 'Interface': 'eth1/1', 'Interface_Profile': 'P',
+                 'Selector': 'S', 'Switch_Profile': '1008', 'fields': {'Status': ['up', 'down']}}]
+    ok = entries == expected and counts['unchanged'] == 1
+    print(f"duplicate key rows: {'OK' if ok else f'FAILED, got {entries}'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() else 1)
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+
+from aci_dn import parse_dn
+from aci_session import KEEP_SESSION, TOKEN_LIFETIME, TokenCache, ask_password
+from aci_snapshot import CLASS_TABLES
+
+# Read-only REST path for reports: class queries come back as raw JSON over a
+# keep-alive HTTP session and are decoded straight into the same flat rows
+# the snapshot stores, without building cobra MOs. Writes stay on cobra.
+
+# --- SETTINGS ---
+REST_PAGE_SIZE = 10000  # Objects per page; the whole class is read either way
+REST_TIMEOUT = 120  # Seconds per HTTP request
+
+
+def query_params(spec, page=None, page_size=None):
+    # The APIC options cobra would send for the same QuerySpec
+    params = {}
+    if spec.subtree:
+        params['rsp-subtree'] = spec.subtree
+    if spec.subtree_classes:
+        params['rsp-subtree-class'] = ",".join(spec.subtree_classes)
+    if spec.prop_include:
+        params['rsp-prop-include'] = spec.prop_include
+    if spec.target_filter:
+        params['query-target-filter'] = spec.target_filter
+    if page_size:
+        params['order-by'] = f"{spec.class_name}.dn"
+        params['page'] = str(page)
+        params['page-size'] = str(page_size)
+    return params
+
+
+def iter_children(node, parent_dn):
+    # (class, body, dn) of the direct children in a JSON subtree. Child
+    # attributes carry an rn and usually no dn.
+    for child in node.get('children', ()):
+        for class_name, body in child.items():
+            attrs = body['attributes']
+            yield class_name, body, attrs.get('dn') or f"{parent_dn}/{attrs['rn']}"
+
+
+def json_rows(class_name, imdata):
+    # JSON twin of aci_snapshot.extract_rows(): {table: [row, ...]}
+    rows = {table: [] for table in CLASS_TABLES[class_name][0]}
+    for item in imdata:
+        body = item[class_name]
+        attrs = body['attributes']
+        dn_str = attrs['dn']
+        if class_name == 'ethpmPhysIf':
+            dn = parse_dn(dn_str)
+            rows['phys_if'].append((dn_str, dn.pod, dn.node, dn.interface, attrs['operSt']))
+        elif class_name == 'fvRsPathAtt':
+            dn = parse_dn(dn_str)
+            rows['path_att'].append((dn_str, dn.tenant, dn.ap, dn.epg, dn.pod, dn.node, dn.path, dn.interface))
+        elif class_name == 'fvRsDomAtt':
+            dn = parse_dn(dn_str)
+            rows['dom_att'].append((dn_str, dn.tenant, dn.ap, dn.epg, attrs['tDn']))
+        elif class_name == 'infraAccPortP':
+            for child_class, child, child_dn in iter_children(body, dn_str):
+                if child_class != 'infraHPortS':
+                    continue
+                pg = "None"
+                for gc_class, gc, gc_dn in iter_children(child, child_dn):
+                    gc_attrs = gc['attributes']
+                    if gc_class == 'infraPortBlk':
+                        rows['port_block'].append((gc_dn, child_dn, attrs['name'], int(gc_attrs['fromCard']),
+                                                   int(gc_attrs['toCard']), int(gc_attrs['fromPort']),
+                                                   int(gc_attrs['toPort'])))
+                    if gc_class == 'infraRsAccBaseGrp':
+                        pg = gc_attrs['tDn'].split('/')[-1]
+                rows['port_selector'].append((child_dn, attrs['name'], child['attributes']['name'], pg))
+        elif class_name == 'infraNodeP':
+            for child_class, child, child_dn in iter_children(body, dn_str):
+                if child_class == 'infraLeafS':
+                    for gs_class, gs, _ in iter_children(child, child_dn):
+                        if gs_class == 'infraNodeBlk':
+                            rows['node_block'].append((attrs['name'], int(gs['attributes']['from_']),
+                                                       int(gs['attributes']['to_'])))
+                if child_class == 'infraRsAccPortP':
+                    rows['switch_port_profile'].append((attrs['name'], parse_dn(child['attributes']['tDn']).profile))
+        elif class_name == 'fabricNode':
+            dn = parse_dn(dn_str)
+            rows['fabric_node'].append((dn_str, dn.pod, dn.node))
+        elif class_name == 'fabricPathEp':
+            dn = parse_dn(dn_str)
+            rows['path_ep'].append((dn_str, dn.pod, dn.node, dn.interface))
+    return rows
+
+
+class RestReader:
+    # Logged-in APIC REST session for class reads. Each worker thread keeps
+    # its own keep-alive connection; all of them share the login token.
+    # With record_dir set, every response body is also saved as
+    # <class>.<page>.json for bench_aci_rest.py. With metrics set, every page
+    # is booked to it like an InstrumentedMoDirectory query.
+
+    def __init__(self, url, username, password, page_size=REST_PAGE_SIZE, record_dir=None, metrics=None):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.page_size = page_size
+        self.record_dir = record_dir
+        self.metrics = metrics
+        self.token = None
+        self._local = threading.local()
+
+    def _http(self):
+        import requests
+
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = requests.Session()
+            http.verify = False
+        if self.token:
+            http.cookies.set('APIC-cookie', self.token)
+        return http
+
+    def login(self):
+        # Without a password, reuses the token cached by aci_session while APIC
+        # still accepts it; a typed password always logs in
+        cache = TokenCache()
+        entry = None if self.password else cache.get(self.url, self.username)
+        if entry:
+            self.token = entry['token']
+            try:
+                reply = self._http().get(f"{self.url}/api/aaaRefresh.json", timeout=REST_TIMEOUT)
+            except Exception:
+                reply = None
+            if reply is not None and reply.ok:
+                return self._logged_in(cache, reply)
+            cache.drop(self.url, self.username)
+            self.token = None
+        if not self.password:
+            self.password = ask_password(self.url, self.username)
+        body = {'aaaUser': {'attributes': {'name': self.username, 'pwd': self.password}}}
+        reply = self._http().post(f"{self.url}/api/aaaLogin.json", json=body, timeout=REST_TIMEOUT)
+        reply.raise_for_status()
+        return self._logged_in(cache, reply)
+
+    def _logged_in(self, cache, reply):
+        attributes = reply.json()['imdata'][0]['aaaLogin']['attributes']
+        self.token = attributes['token']
+        if KEEP_SESSION:
+            cache.put(self.url, self.username, self.token, int(attributes.get('refreshTimeoutSeconds') or TOKEN_LIFETIME))
+        return self
+
+    def logout(self):
+        if KEEP_SESSION:
+            return  # the cached token stays valid for the next run
+        TokenCache().drop(self.url, self.username, self.token)
+        body = {'aaaUser': {'attributes': {'name': self.username}}}
+        try:
+            self._http().post(f"{self.url}/api/aaaLogout.json", json=body, timeout=REST_TIMEOUT)
+        except Exception:
+            pass
+
+    def get(self, path, params):
+        response = self._http().get(f"{self.url}{path}", params=params, timeout=REST_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def class_imdata(self, spec):
+        # imdata of every page of a class query, each body decoded once
+        page = 0
+        while True:
+            started = time.perf_counter()
+            content = self.get(f"/api/class/{spec.class_name}.json", query_params(spec, page, self.page_size))
+            if self.record_dir:
+                os.makedirs(self.record_dir, exist_ok=True)
+                with open(os.path.join(self.record_dir, f"{spec.class_name}.{page}.json"), 'wb') as record:
+                    record.write(content)
+            payload = json.loads(content)
+            if self.metrics:
+                self.metrics.record('rest_query', spec.class_name, time.perf_counter() - started,
+                                    len(payload['imdata']), len(content))
+            yield payload['imdata']
+            if (page + 1) * self.page_size >= int(payload.get('totalCount', 0)):
+                break
+            page += 1
+
+
+def rest_fetch_rows(reader, class_name):
+    # Drop-in for aci_snapshot.fetch_rows() over a RestReader
+    started = time.time()
+    count = 0
+    rows = {table: [] for table in CLASS_TABLES[class_name][0]}
+    for imdata in reader.class_imdata(CLASS_TABLES[class_name][1]):
+        count += len(imdata)
+        for table, table_rows in json_rows(class_name, imdata).items():
+            rows[table].extend(table_rows)
+    print(f"  -> {class_name}: {count} objects over REST, {time.time() - started:.1f}s")
+    return count, rows
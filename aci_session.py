@@ -0,0 +1,235 @@
+import getpass
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+from aci_metrics import InstrumentedMoDirectory, Metrics, requests_session
+
+# Shared APIC login for every script; a background thread keeps the token
+# fresh with aaaRefresh for as long as the process runs. logout() logs out
+# and forgets the token. With ACI_KEEP_SESSION=1 it instead leaves the token
+# valid in a cache file (mode 0600), so a report, its dry run and the apply
+# share one AAA login: while the cached token is valid, the next run with
+# ACI_KEEP_SESSION=1 does not ask for a password, and when APIC rejects it
+# the password is asked for then. Reuse is opt-in because a cached token
+# lets anyone with the account's files act as that APIC user without a
+# password. Set ACI_TOKEN_CACHE to another cache file.
+#
+# Conventions the scripts share: input files are read and checked before
+# prompt_credentials(), so a bad file fails before anyone types a password;
+# cobra, and requests that ships with it, are imported inside the functions
+# that use them, because the model packages are slow to import and input
+# checks and the REST path never need them; a run with failed changes exits
+# 1, so aci_batch.py sees the failure.
+
+# --- SETTINGS ---
+TOKEN_CACHE = os.environ.get('ACI_TOKEN_CACHE', os.path.join(os.path.expanduser('~'), '.aci_token_cache.json'))
+KEEP_SESSION = os.environ.get('ACI_KEEP_SESSION', '') not in ('', '0')  # Leave the login valid for the next run
+TOKEN_LIFETIME = 600  # Seconds, APIC's default when the login reply does not say
+REFRESH_MARGIN = 120  # Refresh a token this long before it would expire
+POOL_SIZE = 16  # Keep-alive connections per APIC, enough for every worker thread
+
+
+def apic_url(host):
+    # http://host:port reaches aci_mock_apic.py; a bare host means HTTPS
+    host = host.strip()
+    return host if "://" in host else f"https://{host}"
+
+
+def prompt_credentials():
+    # With KEEP_SESSION, the password is None when a cached token of this
+    # user is still valid; login() asks for it only if APIC no longer
+    # accepts that token
+    apic = input("APIC IP or hostname: ").strip()
+    username = input("Username: ").strip()
+    if apic and username and TokenCache().get(apic_url(apic), username):
+        if KEEP_SESSION:
+            print(f"Using the cached APIC session of {username}; no password needed.")
+            return apic, username, None
+        print(f"A cached APIC session of {username} exists; set ACI_KEEP_SESSION=1 to reuse it without a password.")
+    password = getpass.getpass("Password: ")
+    return apic, username, password
+
+
+def credentials_given(apic, username, password):
+    # password None means a cached session is reused, '' that none was typed
+    return bool(apic and username and password != "")
+
+
+def ask_password(url, username):
+    return getpass.getpass(f"Cached APIC session of {username}@{url} has expired. Password: ")
+
+
+def run_with_credentials(argv, cwd, log, host, username, password):
+    # Runs a script in a child process and answers its prompt_credentials()
+    # on stdin; a new session has no terminal, so getpass falls back to
+    # reading stdin as well. Returns (exit code, resource usage).
+    process = subprocess.Popen([sys.executable, *argv], cwd=cwd, stdin=subprocess.PIPE, stdout=log,
+                               stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        process.stdin.write(f"{host}\n{username}\n{password}\n".encode())
+        process.stdin.close()
+    except BrokenPipeError:
+        pass  # the script exited before asking, e.g. on a bad input file
+    _, status, usage = os.wait4(process.pid, 0)
+    return os.waitstatus_to_exitcode(status), usage
+
+
+class TokenCache:
+    # {"user@url": {"token": ..., "expires": epoch}} in one JSON file that only
+    # the owner can read. A cache readable by anyone else is ignored.
+
+    def __init__(self, path=TOKEN_CACHE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        if os.stat(self.path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            print(f"[WARNING] Ignoring token cache {self.path}: it is readable by other users (chmod 600 it)")
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except ValueError:
+            return {}
+
+    def get(self, url, username):
+        # The cached entry for url/username if it has not expired
+        entry = self._read().get(f"{username}@{url}")
+        if entry and entry['expires'] > time.time():
+            return entry
+        return None
+
+    def _write(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding="utf-8") as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(tmp_path, self.path)
+
+    def put(self, url, username, token, lifetime):
+        if not self.path:
+            return
+        with self._lock:
+            entries = {key: entry for key, entry in self._read().items() if entry['expires'] > time.time()}
+            entries[f"{username}@{url}"] = {'token': token, 'expires': time.time() + lifetime}
+            self._write(entries)
+
+    def drop(self, url, username, token=None):
+        # With a token, only if it is still the cached one
+        if not self.path:
+            return
+        with self._lock:
+            entries = self._read()
+            entry = entries.get(f"{username}@{url}")
+            if entry is not None and token in (None, entry['token']):
+                del entries[f"{username}@{url}"]
+                self._write(entries)
+
+
+class CachedDirectory:
+    # cobra MoDirectory whose login() reuses a cached token when no password
+    # was given and whose logout() keeps it valid only with KEEP_SESSION.
+    # Everything else goes straight to the MoDirectory.
+
+    def __init__(self, login_session, url, username, cache=None):
+        import cobra.mit.access
+
+        self._mo_dir = cobra.mit.access.MoDirectory(login_session)
+        self.login_session = login_session
+        self.url = url
+        self.username = username
+        self.cache = cache or TokenCache()
+        self.expires = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        http = requests_session(self._mo_dir)
+        if http is not None:
+            from requests.adapters import HTTPAdapter
+
+            for prefix in ('https://', 'http://'):
+                http.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+
+    def __getattr__(self, name):
+        return getattr(self._mo_dir, name)
+
+    def _lifetime(self):
+        return int(getattr(self.login_session, 'refreshTimeoutSeconds', 0) or TOKEN_LIFETIME)
+
+    def _save(self):
+        lifetime = self._lifetime()
+        self.expires = time.time() + lifetime
+        if KEEP_SESSION:
+            self.cache.put(self.url, self.username, self.login_session.cookie, lifetime)
+
+    def login(self):
+        # A typed password always logs in, so a wrong one fails here. Without
+        # one, the cached token is checked with aaaRefresh, which also extends
+        # it; a rejected token asks for the password and logs in.
+        entry = None if self.login_session.password else self.cache.get(self.url, self.username)
+        reused = False
+        if entry:
+            self.login_session.cookie = entry['token']
+            reused = self.refresh()
+        if not reused:
+            if not self.login_session.password:
+                self.login_session.password = ask_password(self.url, self.username)
+            self._mo_dir.login()
+            self._save()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._thread.start()
+        return reused
+
+    def refresh(self):
+        # aaaRefresh; False when the token is no longer accepted
+        try:
+            self._mo_dir.reauth()
+        except Exception:
+            self.cache.drop(self.url, self.username)
+            return False
+        self._save()
+        return True
+
+    def _refresh_loop(self):
+        while not self._stop.wait(max(1.0, self.expires - time.time() - REFRESH_MARGIN)):
+            if not self.refresh():
+                print("[WARNING] APIC token refresh failed; logging in again")
+                try:
+                    self._mo_dir.login()
+                    self._save()
+                except Exception as error:
+                    print(f"[WARNING] APIC login failed: {error}")
+                    return
+
+    def logout(self):
+        self._stop.set()
+        if KEEP_SESSION:
+            return  # the cached token stays valid for the next run
+        self.cache.drop(self.url, self.username, self.login_session.cookie)
+        self._mo_dir.logout()
+
+
+def open_session(host, username, password, metrics=None):
+    # (LoginSession, logged-in MoDirectory) for host, booked to metrics. cobra's
+    # session classes are imported here, after the input checks and prompts.
+    import cobra.mit.session
+
+    metrics = metrics or Metrics('aci_session')
+    url = apic_url(host)
+    login_session = cobra.mit.session.LoginSession(url, username, password, secure=False)
+    mo_dir = InstrumentedMoDirectory(CachedDirectory(login_session, url, username), metrics)
+    with metrics.phase('login'):
+        reused = mo_dir.login()
+    print("Reusing cached APIC session.\n" if reused else "Successfully logged into APIC.\n")
+    return login_session, mo_dir
+
+
+def login(host, username, password, metrics=None):
+    return open_session(host, username, password, metrics)[1]
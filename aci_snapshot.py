@@ -0,0 +1,249 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aci_binding_index import BindingIndex
+from aci_bulk import QuerySpec, class_query
+from aci_dn import parse_dn, port_key
+from aci_paths import PATH_QUERIES, PathIndex
+from aci_port_index import PortBlockIndex, Selector
+
+# --- SETTINGS ---
+SNAPSHOT_FILE = 'aci_fabric_snapshot.db'
+SNAPSHOT_TTL = 3600  # Seconds a synced class stays fresh (one maintenance window)
+SYNC_WORKERS = 4
+SCHEMA_VERSION = 3  # Bump when a table changes; older snapshots are rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_meta (class TEXT PRIMARY KEY, synced_at REAL, objects INTEGER, apic TEXT);
+CREATE TABLE IF NOT EXISTS phys_if (dn TEXT PRIMARY KEY, pod TEXT, node TEXT, interface TEXT, oper_st TEXT);
+CREATE INDEX IF NOT EXISTS phys_if_port ON phys_if (node, interface);
+CREATE TABLE IF NOT EXISTS path_att (dn TEXT PRIMARY KEY, tenant TEXT, ap TEXT, epg TEXT,
+                                     pod TEXT, node TEXT, path TEXT, interface TEXT);
+CREATE INDEX IF NOT EXISTS path_att_port ON path_att (node, interface);
+CREATE INDEX IF NOT EXISTS path_att_epg ON path_att (tenant, ap, epg);
+CREATE TABLE IF NOT EXISTS dom_att (dn TEXT PRIMARY KEY, tenant TEXT, ap TEXT, epg TEXT, t_dn TEXT);
+CREATE INDEX IF NOT EXISTS dom_att_target ON dom_att (t_dn, tenant);
+CREATE TABLE IF NOT EXISTS port_selector (dn TEXT PRIMARY KEY, profile TEXT, selector TEXT, policy_group TEXT);
+CREATE INDEX IF NOT EXISTS port_selector_name ON port_selector (profile, selector);
+CREATE TABLE IF NOT EXISTS port_block (dn TEXT PRIMARY KEY, selector_dn TEXT, profile TEXT, from_card INTEGER,
+                                       to_card INTEGER, from_port INTEGER, to_port INTEGER);
+CREATE INDEX IF NOT EXISTS port_block_profile ON port_block (profile);
+CREATE TABLE IF NOT EXISTS node_block (switch_profile TEXT, from_node INTEGER, to_node INTEGER);
+CREATE TABLE IF NOT EXISTS switch_port_profile (switch_profile TEXT, profile TEXT);
+CREATE TABLE IF NOT EXISTS fabric_node (dn TEXT PRIMARY KEY, pod TEXT, node TEXT);
+CREATE TABLE IF NOT EXISTS path_ep (dn TEXT PRIMARY KEY, pod TEXT, node TEXT, interface TEXT);
+"""
+
+# Tables filled from each class, and the query that fetches only what they hold.
+CLASS_TABLES = {
+    'ethpmPhysIf': (('phys_if',), QuerySpec('ethpmPhysIf')),
+    'fvRsPathAtt': (('path_att',), QuerySpec('fvRsPathAtt', prop_include='naming-only')),
+    'fvRsDomAtt': (('dom_att',), QuerySpec('fvRsDomAtt', prop_include='naming-only')),
+    'infraAccPortP': (('port_selector', 'port_block'), QuerySpec(
+        'infraAccPortP', subtree='full', prop_include='config-only',
+        subtree_classes=('infraHPortS', 'infraPortBlk', 'infraRsAccBaseGrp'))),
+    'infraNodeP': (('node_block', 'switch_port_profile'), QuerySpec(
+        'infraNodeP', subtree='full', prop_include='config-only',
+        subtree_classes=('infraLeafS', 'infraNodeBlk', 'infraRsAccPortP'))),
+    'fabricNode': (('fabric_node',), PATH_QUERIES['fabricNode']),
+    'fabricPathEp': (('path_ep',), PATH_QUERIES['fabricPathEp']),
+}
+
+
+def extract_rows(class_name, mos):
+    # Flatten MOs of one class into {table: [row, ...]}
+    import cobra.model.infra
+
+    rows = {table: [] for table in CLASS_TABLES[class_name][0]}
+    for mo in mos:
+        dn_str = str(mo.dn)
+        if class_name == 'ethpmPhysIf':
+            dn = parse_dn(dn_str)
+            rows['phys_if'].append((dn_str, dn.pod, dn.node, dn.interface, mo.operSt))
+        elif class_name == 'fvRsPathAtt':
+            dn = parse_dn(dn_str)
+            rows['path_att'].append((dn_str, dn.tenant, dn.ap, dn.epg, dn.pod, dn.node, dn.path, dn.interface))
+        elif class_name == 'fvRsDomAtt':
+            dn = parse_dn(dn_str)
+            rows['dom_att'].append((dn_str, dn.tenant, dn.ap, dn.epg, str(mo.tDn)))
+        elif class_name == 'infraAccPortP':
+            for child in mo.children:
+                if isinstance(child, cobra.model.infra.HPortS):
+                    pg = "None"
+                    for gc in child.children:
+                        if isinstance(gc, cobra.model.infra.PortBlk):
+                            rows['port_block'].append((str(gc.dn), str(child.dn), mo.name, int(gc.fromCard),
+                                                       int(gc.toCard), int(gc.fromPort), int(gc.toPort)))
+                        if isinstance(gc, cobra.model.infra.RsAccBaseGrp):
+                            pg = str(gc.tDn).split('/')[-1]
+                    rows['port_selector'].append((str(child.dn), mo.name, child.name, pg))
+        elif class_name == 'infraNodeP':
+            for child in mo.children:
+                if isinstance(child, cobra.model.infra.LeafS):
+                    for gs in child.children:
+                        if isinstance(gs, cobra.model.infra.NodeBlk):
+                            rows['node_block'].append((mo.name, int(gs.from_), int(gs.to_)))
+                if isinstance(child, cobra.model.infra.RsAccPortP):
+                    rows['switch_port_profile'].append((mo.name, parse_dn(str(child.tDn)).profile))
+        elif class_name == 'fabricNode':
+            dn = parse_dn(dn_str)
+            rows['fabric_node'].append((dn_str, dn.pod, dn.node))
+        elif class_name == 'fabricPathEp':
+            dn = parse_dn(dn_str)
+            rows['path_ep'].append((dn_str, dn.pod, dn.node, dn.interface))
+    return rows
+
+
+def fetch_rows(mo_dir, class_name):
+    mos = mo_dir.query(class_query(CLASS_TABLES[class_name][1]))
+    return len(mos), extract_rows(class_name, mos)
+
+
+class FabricSnapshot:
+    # Local SQLite copy of the fabric state the scripts read, filled by one
+    # bulk class query per class. Each class carries its sync time and the
+    # APIC it came from; a class older than the TTL, or synced from another
+    # APIC, is stale and must be re-synced before it is used.
+
+    def __init__(self, path=SNAPSHOT_FILE, ttl=SNAPSHOT_TTL, apic=None):
+        self.path = path
+        self.ttl = ttl
+        self.apic = apic
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # A snapshot is only a cache: rebuild it rather than migrate it
+            tables = [name for (name,) in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for table in tables:
+                self.db.execute(f"DROP TABLE {table}")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def synced_at(self, class_name):
+        # When the class was last synced from this snapshot's APIC; None if
+        # never, or if the rows came from another APIC
+        row = self.db.execute("SELECT synced_at, apic FROM sync_meta WHERE class = ?", (class_name,)).fetchone()
+        return row[0] if row and row[1] == self.apic else None
+
+    def stale_classes(self, classes):
+        now = time.time()
+        return [c for c in classes if (self.synced_at(c) or 0) + self.ttl < now]
+
+    def describe(self, classes):
+        now = time.time()
+        ages = []
+        for class_name in classes:
+            synced_at = self.synced_at(class_name)
+            ages.append(f"{class_name}={'never' if synced_at is None else f'{now - synced_at:.0f}s'}")
+        return f"{self.path} of {self.apic} ({', '.join(ages)}, ttl={self.ttl}s)"
+
+    def sync(self, mo_dir, classes, workers=SYNC_WORKERS, fetch=None):
+        # fetch(source, class) -> (count, rows); cobra's fetch_rows by default
+        fetch = fetch or fetch_rows
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {c: pool.submit(fetch, mo_dir, c) for c in classes}
+            for class_name, future in futures.items():
+                count, rows = future.result()
+                with self.db:
+                    for table, table_rows in rows.items():
+                        self.db.execute(f"DELETE FROM {table}")
+                        if table_rows:
+                            marks = ",".join("?" * len(table_rows[0]))
+                            self.db.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({marks})", table_rows)
+                    self.db.execute("INSERT OR REPLACE INTO sync_meta VALUES (?, ?, ?, ?)",
+                                    (class_name, time.time(), count, self.apic))
+                print(f"  -> snapshot {class_name}: {count} objects")
+        print(f"Snapshot synced in {time.time() - started:.1f}s: {self.path}")
+
+    # --- Readers used by the scripts ---
+
+    def oper_status_map(self):
+        return {port_key(node, interface): oper_st
+                for node, interface, oper_st in self.db.execute("SELECT node, interface, oper_st FROM phys_if WHERE interface IS NOT NULL")}
+
+    def oper_state_by_dn(self, dns=None):
+        rows = self.db.execute("SELECT dn, oper_st FROM phys_if")
+        if dns is None:
+            return dict(rows)
+        dns = set(dns)
+        return {dn: oper_st for dn, oper_st in rows if dn in dns}
+
+    def epg_binding_map(self):
+        bindings = BindingIndex()
+        for tenant, ap, epg, node, interface in self.db.execute(
+                "SELECT tenant, ap, epg, node, interface FROM path_att "
+                "WHERE epg IS NOT NULL AND interface IS NOT NULL ORDER BY rowid"):
+            bindings.add(node, interface, f"{tenant}/{ap}/{epg}")
+        return bindings
+
+    def path_att_dns(self, tenants=None):
+        rows = self.db.execute("SELECT dn, tenant FROM path_att")
+        return {dn for dn, tenant in rows if tenants is None or tenant in tenants}
+
+    def dom_att_dns(self, tenant, domain_dn):
+        return {dn for (dn,) in self.db.execute(
+            "SELECT dn FROM dom_att WHERE t_dn = ? AND tenant = ?", (domain_dn, tenant))}
+
+    def selector_dns(self):
+        return {dn for (dn,) in self.db.execute("SELECT dn FROM port_selector")}
+
+    def port_index(self):
+        port_index = PortBlockIndex()
+        selectors = {dn: Selector(name, pg) for dn, name, pg in
+                     self.db.execute("SELECT dn, selector, policy_group FROM port_selector")}
+        for _, selector_dn, profile, from_card, to_card, from_port, to_port in self.port_blocks():
+            port_index.add(profile, selectors[selector_dn], from_card, to_card, from_port, to_port)
+        return port_index
+
+    def selectors(self):
+        # {selector dn: (profile, Selector)}
+        return {dn: (profile, Selector(name, pg)) for dn, profile, name, pg in
+                self.db.execute("SELECT dn, profile, selector, policy_group FROM port_selector")}
+
+    def port_blocks(self):
+        # (dn, selector dn, profile, from card, to card, from port, to port) in sync order
+        return self.db.execute("SELECT * FROM port_block ORDER BY rowid").fetchall()
+
+    def path_index(self):
+        paths = PathIndex()
+        for _, pod, node in self.db.execute("SELECT * FROM fabric_node"):
+            paths.add_node(node, pod)
+        for (dn,) in self.db.execute("SELECT dn FROM path_ep"):
+            paths.add_path(dn)
+        return paths
+
+    def switch_profiles(self):
+        nodes, prof_names = {}, {}
+        for name, from_node, to_node in self.db.execute("SELECT * FROM node_block"):
+            nodes.setdefault(name, set()).update(range(from_node, to_node + 1))
+        for name, profile in self.db.execute("SELECT * FROM switch_port_profile ORDER BY rowid"):
+            prof_names.setdefault(name, []).append(profile)
+        return [(name, [str(n) for n in sorted(nodes.get(name, ()))], prof_names.get(name, []))
+                for name in sorted(set(nodes) | set(prof_names))]
+
+
+def add_snapshot_arguments(parser):
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_FILE, metavar="DB",
+                        help=f"read fabric state from a local snapshot, syncing it when stale (default: {SNAPSHOT_FILE})")
+    parser.add_argument("--snapshot-ttl", type=int, default=SNAPSHOT_TTL,
+                        help=f"seconds before a snapshotted class is re-synced (default: {SNAPSHOT_TTL})")
+    parser.add_argument("--refresh", action="store_true", help="force a snapshot re-sync even if it is fresh")
+
+
+def open_snapshot(args, apic, classes, connect, fetch=None):
+    # Returns a snapshot of apic whose classes are fresh, syncing the stale
+    # ones (or all of them with --refresh) through connect(), which must
+    # return a logged-in MoDirectory for apic. connect() is not called when
+    # nothing is stale.
+    snapshot = FabricSnapshot(args.snapshot, args.snapshot_ttl, apic)
+    stale = list(classes) if args.refresh else snapshot.stale_classes(classes)
+    if stale:
+        print(f"Syncing snapshot of {apic} for {', '.join(stale)}...")
+        snapshot.sync(connect(), stale, fetch=fetch)
+    else:
+        print(f"Using snapshot {snapshot.describe(classes)}, no APIC queries needed.")
+    return snapshot
@@ -0,0 +1,310 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from aci_dn import parse_dn, port_key
+from aci_paths import BUNDLE_PREFIX
+from aci_port_index import PortBlockIndex, Selector
+from aci_port_mapping_full import OUTPUT_FILE, REPORT_CLASSES, REPORT_FIELDS, open_session, report_row
+from aci_session import apic_url, prompt_credentials
+from aci_snapshot import FabricSnapshot, open_snapshot
+from aci_websocket import WebSocket, WebSocketClosed
+
+# --- SETTINGS ---
+WATCH_CLASSES = ['ethpmPhysIf', 'fvRsPathAtt', 'infraHPortS', 'infraPortBlk']
+SUBSCRIPTION_REFRESH = 45  # Seconds; APIC drops a subscription not refreshed within 90s
+TOKEN_REFRESH = 300  # Seconds between aaaRefresh calls, well inside the default 600s token timeout
+FLUSH_INTERVAL = 2.0  # Seconds between report rewrites while events keep arriving
+RECV_TIMEOUT = 1.0  # Seconds the event loop waits for a message before checking for a flush
+
+
+class Subscriptions:
+    # APIC class subscriptions over the REST session behind the websocket.
+    # Subscriptions and the token are refreshed from a background thread for
+    # as long as the watch runs, including while the baseline is fetched.
+
+    def __init__(self, url, token):
+        import requests
+
+        self.url = url
+        self.http = requests.Session()
+        self.http.verify = False
+        self.http.cookies.set('APIC-cookie', token)
+        self.ids = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+
+    def _get(self, path, **params):
+        response = self.http.get(f"{self.url}{path}", params=params, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def subscribe(self, class_name):
+        # One object is enough: the point is the subscription id, not the data
+        reply = self._get(f"/api/class/{class_name}.json", **{'subscription': 'yes', 'page-size': '1'})
+        self.ids.append(reply['subscriptionId'])
+        return reply['subscriptionId']
+
+    def start(self):
+        self._thread.start()
+
+    def _refresh_loop(self):
+        last_token = time.time()
+        while not self._stop.wait(SUBSCRIPTION_REFRESH):
+            try:
+                if time.time() - last_token >= TOKEN_REFRESH:
+                    token = self._get("/api/aaaRefresh.json")['imdata'][0]['aaaLogin']['attributes']['token']
+                    self.http.cookies.set('APIC-cookie', token)
+                    last_token = time.time()
+                for subscription_id in self.ids:
+                    self._get("/api/subscriptionRefresh.json", id=subscription_id)
+            except Exception as error:
+                print(f"[WARNING] Subscription refresh failed: {error}")
+
+    def stop(self):
+        self._stop.set()
+
+
+class WatchedReport:
+    # The report held in memory with the state it was built from. Events are
+    # folded into that state and only the rows they touch are recomputed:
+    # port events (ethpmPhysIf, fvRsPathAtt) re-render the rows of one port
+    # (every member port for a PC/vPC binding), selector events (infraHPortS,
+    # infraPortBlk) re-index one profile.
+
+    def __init__(self, snapshot):
+        self.oper_status_map = snapshot.oper_status_map()
+        self.bindings = snapshot.epg_binding_map()
+        self.switch_profiles = snapshot.switch_profiles()
+        self.selectors = snapshot.selectors()  # selector dn -> (profile, Selector)
+        self.blocks = {dn: [selector_dn, profile, from_card, to_card, from_port, to_port]
+                       for dn, selector_dn, profile, from_card, to_card, from_port, to_port in snapshot.port_blocks()}
+        self.port_index = PortBlockIndex()
+        self.rows = {}  # (switch profile, profile, node, card, port) -> row
+        self.rows_by_port = defaultdict(set)  # "node/card/port" -> {row key}
+        self.rows_by_profile = defaultdict(set)  # profile -> {row key}
+        self.events = 0
+        self._order = {}
+        for sp_pos, (sp_name, _, prof_names) in enumerate(self.switch_profiles):
+            for prof_pos, prof_name in enumerate(prof_names):
+                self._order.setdefault((sp_name, prof_name), (sp_pos, prof_pos))
+
+        for profile in {profile for _, profile, *_ in self.blocks.values()}:
+            self._index_profile(profile)
+        for profile in list(self.port_index.profiles()):
+            self._render_profile(profile)
+
+    def _index_profile(self, profile):
+        self.port_index.discard(profile)
+        for selector_dn, block_profile, from_card, to_card, from_port, to_port in self.blocks.values():
+            if block_profile != profile:
+                continue
+            selector = self.selectors.get(selector_dn)
+            selector = selector[1] if selector else Selector(parse_dn(selector_dn).selector, "None")
+            self.port_index.add(profile, selector, from_card, to_card, from_port, to_port)
+
+    def _render_profile(self, profile):
+        # Returns {row key: row} for every port of the profile on every node
+        rows = {}
+        for sp_name, nodes, prof_names in self.switch_profiles:
+            if profile not in prof_names:
+                continue
+            for node in nodes:
+                for card, port, selectors in self.port_index.iter_ports(profile):
+                    rows[(sp_name, profile, node, card, port)] = report_row(
+                        node, card, port, selectors[0], profile, sp_name, self.oper_status_map, self.bindings)
+        for key, row in rows.items():
+            self.rows[key] = row
+            self.rows_by_port[f"{key[2]}/{key[3]}/{key[4]}"].add(key)
+            self.rows_by_profile[profile].add(key)
+        return rows
+
+    def _drop_profile(self, profile):
+        rows = {}
+        for key in self.rows_by_profile.pop(profile, ()):
+            rows[key] = self.rows.pop(key)
+            self.rows_by_port[f"{key[2]}/{key[3]}/{key[4]}"].discard(key)
+        return rows
+
+    def _apply_event(self, class_name, attrs, ports, profiles):
+        dn_str = attrs.get('dn', '')
+        dn = parse_dn(dn_str)
+        deleted = attrs.get('status') == 'deleted'
+        if class_name == 'ethpmPhysIf' and dn.node and dn.interface:
+            key = port_key(dn.node, dn.interface)
+            if deleted:
+                self.oper_status_map.pop(key, None)
+            elif 'operSt' in attrs:
+                self.oper_status_map[key] = attrs['operSt']
+            ports.add(key)
+        elif class_name == 'fvRsPathAtt' and dn.epg and dn.node and dn.interface:
+            epg_full_name = f"{dn.tenant}/{dn.ap}/{dn.epg}"
+            if deleted:
+                self.bindings.discard(dn.node, dn.interface, epg_full_name)
+            else:
+                self.bindings.add(dn.node, dn.interface, epg_full_name)
+            if dn.interface.startswith('eth'):
+                ports.add(port_key(dn.node, dn.interface))
+            else:
+                # A PC/vPC binding changes the rows of its member ports
+                members, policy_group = dn.node.split('-'), f"{BUNDLE_PREFIX}{dn.interface}"
+                ports.update(f"{key[2]}/{key[3]}/{key[4]}" for key, row in self.rows.items()
+                             if key[2] in members and row['Policy_Group'] == policy_group)
+        elif class_name == 'infraHPortS' and dn.profile:
+            if deleted:
+                self.selectors.pop(dn_str, None)
+                for block_dn in [b for b, block in self.blocks.items() if block[0] == dn_str]:
+                    del self.blocks[block_dn]
+            elif dn_str not in self.selectors:
+                # The policy group arrives with infraRsAccBaseGrp, which is not watched
+                self.selectors[dn_str] = (dn.profile, Selector(dn.selector, "None"))
+            profiles.add(dn.profile)
+        elif class_name == 'infraPortBlk' and dn.profile:
+            if deleted:
+                self.blocks.pop(dn_str, None)
+            else:
+                # Creations carry every attribute, modifications only the changed ones
+                block = self.blocks.setdefault(
+                    dn_str, [dn_str.rsplit('/portblk-', 1)[0], dn.profile, 1, 1, 1, 1])
+                for i, name in enumerate(('fromCard', 'toCard', 'fromPort', 'toPort'), start=2):
+                    if name in attrs:
+                        block[i] = int(attrs[name])
+            profiles.add(dn.profile)
+        else:
+            return False
+        return True
+
+    def apply(self, message):
+        # Folds one websocket message into the state and returns the row
+        # changes as [(key, old row or None, new row or None)].
+        ports, profiles = set(), set()
+        for item in message.get('imdata', []):
+            for class_name, body in item.items():
+                if self._apply_event(class_name, body.get('attributes', {}), ports, profiles):
+                    self.events += 1
+
+        before, after = {}, {}
+        for profile in profiles:
+            before.update(self._drop_profile(profile))
+            self._index_profile(profile)
+            after.update(self._render_profile(profile))
+        for key in ports:
+            for row_key in self.rows_by_port.get(key, ()):
+                if row_key in after:
+                    continue
+                sp_name, profile, node, card, port = row_key
+                before[row_key] = self.rows[row_key]
+                selector = self.port_index.lookup(profile, card, port)[0]
+                self.rows[row_key] = after[row_key] = report_row(
+                    node, card, port, selector, profile, sp_name, self.oper_status_map, self.bindings)
+        return [(key, before.get(key), after.get(key))
+                for key in sorted(set(before) | set(after), key=self._sort_key)
+                if before.get(key) != after.get(key)]
+
+    def _sort_key(self, key):
+        sp_name, profile, node, card, port = key
+        return self._order.get((sp_name, profile), (0, 0)), int(node), card, port
+
+    def write(self, path=OUTPUT_FILE):
+        # Written next to the report and renamed over it, so readers never see half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, mode='w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            for key in sorted(self.rows, key=self._sort_key):
+                writer.writerow(self.rows[key])
+        os.replace(tmp_path, path)
+
+
+def describe_change(key, old, new):
+    sp_name, profile, node, card, port = key
+    where = f"{node} eth{card}/{port} ({profile}, {sp_name})"
+    if old is None:
+        return f"[ADDED] {where} selector={new['Selector']}"
+    if new is None:
+        return f"[REMOVED] {where} selector={old['Selector']}"
+    diffs = "; ".join(f"{field} {old[field]} -> {new[field]}" for field in REPORT_FIELDS if old[field] != new[field])
+    return f"[CHANGED] {where}: {diffs}"
+
+
+def watch_report(args):
+    # Asked for up front: a fresh snapshot still has to match the APIC
+    credentials = prompt_credentials()
+    session = []
+
+    def connect():
+        if not session:
+            session.extend(open_session(credentials=credentials))
+        return session[1]
+
+    subscriptions = None
+    websocket = None
+    try:
+        if args.watch_url:
+            websocket = WebSocket(args.watch_url, timeout=RECV_TIMEOUT)
+            print(f"Listening for events on {args.watch_url}")
+        else:
+            connect()
+            login_session = session[0]
+            host = urlsplit(login_session.url).netloc
+            websocket = WebSocket(f"wss://{host}/socket{login_session.cookie}", timeout=RECV_TIMEOUT)
+            subscriptions = Subscriptions(login_session.url, login_session.cookie)
+            for class_name in WATCH_CLASSES:
+                subscriptions.subscribe(class_name)
+            subscriptions.start()
+            print(f"Subscribed to {', '.join(WATCH_CLASSES)}")
+
+        # Subscribed first, so events raised during the baseline queue up on the socket
+        if args.snapshot:
+            snapshot = open_snapshot(args, apic_url(credentials[0]), REPORT_CLASSES, connect)
+        else:
+            snapshot = FabricSnapshot(':memory:')
+            snapshot.sync(connect(), REPORT_CLASSES)
+        report = WatchedReport(snapshot)
+        snapshot.close()
+    except Exception as e:
+        print(f"Watch setup failed: {e}")
+        if subscriptions:
+            subscriptions.stop()
+        if websocket:
+            websocket.close()
+        if session:
+            session[1].logout()
+        sys.exit(1)
+
+    report.write()
+    print(f"Baseline report ({len(report.rows)} rows) exported to {OUTPUT_FILE}; watching for changes (Ctrl+C to stop)...")
+    dirty = False
+    last_write = time.time()
+    changed_rows = 0
+    try:
+        while True:
+            message = websocket.recv()
+            if message:
+                changes = report.apply(json.loads(message))
+                for change in changes:
+                    print(describe_change(*change))
+                changed_rows += len(changes)
+                dirty = dirty or bool(changes)
+            if dirty and time.time() - last_write >= FLUSH_INTERVAL:
+                report.write()
+                dirty = False
+                last_write = time.time()
+    except WebSocketClosed as e:
+        print(f"Event stream ended: {e}")
+    except KeyboardInterrupt:
+        print("Stopping watch.")
+    finally:
+        if dirty:
+            report.write()
+        if subscriptions:
+            subscriptions.stop()
+        websocket.close()
+        if session:
+            session[1].logout()
+    print(f"Watch summary: events={report.events}, changed rows={changed_rows}, report rows={len(report.rows)}")
@@ -0,0 +1,221 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import ssl
+import struct
+import time
+from urllib.parse import urlsplit
+
+# Minimal RFC 6455 websocket client for APIC event subscriptions, plus a
+# stand-in server that replays recorded events, so watch mode can be run
+# without an APIC and without a third-party websocket package.
+# aci_watch_sample_events.jsonl is a short recording against the default
+# aci_mock_apic.py fabric: a port going down, a vPC binding, an added port
+# block and a deleted selector. To watch it, run
+#   python aci_mock_apic.py
+#   python aci_websocket.py aci_watch_sample_events.jsonl
+#   python aci_cli.py report --watch-url ws://127.0.0.1:8765/
+# and answer the host prompt with http://127.0.0.1:8443.
+
+# --- SETTINGS ---
+REPLAY_PORT = 8765
+REPLAY_INTERVAL = 0.5  # Seconds between replayed messages
+REPLAY_HOLD = 5.0  # Seconds the connection stays open after the last message
+FRAME_TIMEOUT = 60.0  # Seconds the rest of a started frame may take to arrive
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def read_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise WebSocketClosed("connection closed by peer")
+        data += chunk
+    return data
+
+
+def read_http_head(sock):
+    head = b""
+    while b"\r\n\r\n" not in head:
+        chunk = sock.recv(1)
+        if not chunk:
+            raise WebSocketClosed("connection closed during handshake")
+        head += chunk
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def encode_frame(opcode, payload, mask):
+    # Clients must mask what they send, servers must not
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header += bytes([mask_bit | len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack("!Q", len(payload))
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+
+
+def read_frame(sock, head=b""):
+    # head: the frame's first byte(s) when the caller has already read them
+    first, second = head + read_exact(sock, 2 - len(head))
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", read_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", read_exact(sock, 8))[0]
+    key = read_exact(sock, 4) if second & 0x80 else None
+    payload = read_exact(sock, length)
+    if key:
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+class WebSocket:
+    # Blocking client: recv() returns one text message, or None when the
+    # timeout passes without one. Pings are answered, fragments joined. The
+    # timeout only covers waiting for a frame to start; once its first byte
+    # is in, the rest is read whole, so a slow frame never loses sync.
+
+    def __init__(self, url, timeout=None, verify=False):
+        parts = urlsplit(url)
+        secure = parts.scheme in ("wss", "https")
+        port = parts.port or (443 if secure else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        sock = socket.create_connection((parts.hostname, port), timeout=30)
+        if secure:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=parts.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {parts.hostname}:{port}\r\n"
+                      f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        status, headers = read_http_head(sock)
+        if " 101 " not in f"{status} " or headers.get("sec-websocket-accept") != accept_key(key):
+            sock.close()
+            raise WebSocketClosed(f"websocket handshake refused: {status}")
+        self.sock = sock
+        self.timeout = timeout
+        self._fragments = []
+
+    def send(self, text, opcode=OP_TEXT):
+        self.sock.sendall(encode_frame(opcode, text.encode() if isinstance(text, str) else text, mask=True))
+
+    def recv(self):
+        while True:
+            self.sock.settimeout(self.timeout)
+            try:
+                head = self.sock.recv(1)
+            except socket.timeout:
+                return None
+            if not head:
+                raise WebSocketClosed("connection closed by peer")
+            self.sock.settimeout(FRAME_TIMEOUT)
+            try:
+                fin, opcode, payload = read_frame(self.sock, head)
+            except socket.timeout:
+                raise WebSocketClosed(f"frame not completed within {FRAME_TIMEOUT:.0f}s")
+            if opcode == OP_PING:
+                self.send(payload, OP_PONG)
+            elif opcode == OP_CLOSE:
+                raise WebSocketClosed("connection closed by server")
+            elif opcode in (OP_TEXT, OP_BINARY, 0x0):
+                self._fragments.append(payload)
+                if fin:
+                    message = b"".join(self._fragments)
+                    self._fragments = []
+                    return message.decode("utf-8")
+
+    def close(self):
+        try:
+            self.sock.sendall(encode_frame(OP_CLOSE, b"", mask=True))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def read_events(path):
+    # One recorded websocket message per line, as APIC sent it
+    with open(path, encoding="utf-8") as events_file:
+        return [json.loads(line) for line in events_file if line.strip()]
+
+
+class ReplayHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        _, headers = read_http_head(self.request)
+        self.request.sendall((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                              f"Connection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {accept_key(headers.get('sec-websocket-key', ''))}\r\n\r\n").encode())
+        print(f"[REPLAY] Client connected from {self.client_address[0]}, sending {len(server.events)} message(s)")
+        try:
+            for message in server.events:
+                time.sleep(server.interval)
+                self.request.sendall(encode_frame(OP_TEXT, json.dumps(message).encode(), mask=False))
+            time.sleep(server.hold)
+            self.request.sendall(encode_frame(OP_CLOSE, b"", mask=False))
+        except OSError:
+            pass
+        print("[REPLAY] Done")
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    # Stand-in for the APIC /socket endpoint: every client gets the recorded
+    # messages in order, then a close frame.
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, events, interval=REPLAY_INTERVAL, hold=REPLAY_HOLD):
+        super().__init__(address, ReplayHandler)
+        self.events = events
+        self.interval = interval
+        self.hold = hold
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded APIC subscription events over a local websocket.")
+    parser.add_argument("events", help="JSON lines file, one recorded websocket message per line")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=REPLAY_PORT)
+    parser.add_argument("--interval", type=float, default=REPLAY_INTERVAL,
+                        help=f"seconds between messages (default: {REPLAY_INTERVAL})")
+    parser.add_argument("--hold", type=float, default=REPLAY_HOLD,
+                        help=f"seconds to keep the connection open after the last message (default: {REPLAY_HOLD})")
+    args = parser.parse_args()
+    replay = ReplayServer((args.host, args.port), read_events(args.events), args.interval, args.hold)
+    print(f"Replaying {len(replay.events)} message(s) on ws://{args.host}:{args.port}/")
+    try:
+        replay.serve_forever()
+    except KeyboardInterrupt:
+        pass
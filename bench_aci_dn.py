@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+import re
+
+from aci_dn import parse_dn
+
+# Micro-benchmark for aci_dn.parse_dn() against the per-field regex chain the
+# report used to run for every fvRsPathAtt. Usage:
+#   python bench_aci_dn.py --count 1000000 --unique 20000
+
+
+def synthetic_dns(count, unique, seed=7):
+    rng = random.Random(seed)
+    pool = []
+    for i in range(unique):
+        node = 101 + i % 200
+        kind = i % 4
+        if kind == 0:
+            path = f"topology/pod-{1 + i % 2}/paths-{node}/pathep-[eth1/{1 + i % 48}]"
+        elif kind == 1:
+            path = f"topology/pod-1/paths-{node}/extpaths-{101 + i % 20}/pathep-[eth1/{1 + i % 48}]"
+        elif kind == 2:
+            path = f"topology/pod-1/paths-{node}/pathep-[eth1/{1 + i % 48}/{1 + i % 4}]"
+        else:
+            path = f"topology/pod-1/protpaths-{node}-{node + 1}/pathep-[accbundle-PG{i}_ifpg]"
+        pool.append(f"uni/tn-Tenant{i % 12}/ap-App-{i % 40}/epg-VLAN{i % 5000}_10.{i % 250}.0.0/rspathAtt-[{path}]")
+    return [pool[rng.randrange(unique)] for _ in range(count)]
+
+
+def legacy_parse(dn_str):
+    tenant = re.search(r'tn-(.*?)/', dn_str).group(1)
+    app_prof = re.search(r'ap-(.*?)/', dn_str).group(1)
+    epg = re.search(r'epg-(.*?)/', dn_str).group(1)
+    node_id = re.search(r'paths-(\d+)', dn_str).group(1)
+    port = re.search(r'pathep-\[eth(.*?/.*?)\]', dn_str)
+    return tenant, app_prof, epg, node_id, port.group(1) if port else None
+
+
+def run(label, func, dns):
+    started = time.perf_counter()
+    for dn in dns:
+        func(dn)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:8.2f}s {len(dns) / elapsed:14,.0f} DNs/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ACI DN parsing throughput.")
+    parser.add_argument('--count', type=int, default=1000000, help="DNs to parse (default: 1000000)")
+    parser.add_argument('--unique', type=int, default=20000, help="distinct DNs in the sample (default: 20000)")
+    args = parser.parse_args()
+
+    dns = synthetic_dns(args.count, args.unique)
+    print(f"Parsing {args.count:,} synthetic fvRsPathAtt DNs ({args.unique:,} distinct)\n")
+
+    run("regex chain (legacy)", legacy_parse, dns)
+    run("parse_dn, no memo", parse_dn.__wrapped__, dns)
+    parse_dn.cache_clear()
+    run("parse_dn, LRU memo", parse_dn, dns)
+    info = parse_dn.cache_info()
+    print(f"\nLRU hits={info.hits:,} misses={info.misses:,} size={info.currsize:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+from aci_rest import json_rows
+from aci_snapshot import extract_rows
+
+# Decode benchmark for the report read paths on identical payloads: cobra
+# (fromJSONStr into MOs, then extract_rows) against aci_rest (json.loads,
+# then json_rows). Payloads are either recorded with
+#   python aci_port_mapping_full.py --rest --rest-record payloads/
+# and replayed with --payloads payloads/, or generated:
+#   python bench_aci_rest.py --nodes 40 --ports 48 --epgs 20
+# Without the cobra SDK only the raw JSON side runs. --results writes the
+# timings as JSON, to keep the comparison next to the payloads it measured.
+
+CLASSES = ['ethpmPhysIf', 'fvRsPathAtt', 'infraAccPortP', 'infraNodeP']
+
+
+def mo(class_name, children=(), **attributes):
+    body = {'attributes': attributes}
+    if children:
+        body['children'] = list(children)
+    return {class_name: body}
+
+
+def payload(imdata):
+    return json.dumps({'totalCount': str(len(imdata)), 'imdata': imdata})
+
+
+def synthetic_payloads(nodes, ports, epgs):
+    node_ids = range(101, 101 + nodes)
+    phys = [mo('ethpmPhysIf', dn=f"topology/pod-1/node-{n}/sys/phys-[eth1/{p}]/phys",
+               operSt='up' if p % 3 else 'down') for n in node_ids for p in range(1, ports + 1)]
+    paths = [mo('fvRsPathAtt', dn=f"uni/tn-T{e % 8}/ap-App{e % 16}/epg-EPG{e}/rspathAtt-"
+                                  f"[topology/pod-1/paths-{n}/pathep-[eth1/{p}]]")
+             for n in node_ids for p in range(1, ports + 1) for e in range(epgs)]
+    profiles = []
+    for n in node_ids:
+        selectors = [mo('infraHPortS', [mo('infraPortBlk', rn='portblk-b1', fromCard='1', toCard='1',
+                                           fromPort=str(p), toPort=str(p)),
+                                       mo('infraRsAccBaseGrp', rn='rsaccBaseGrp',
+                                          tDn=f"uni/infra/funcprof/accportgrp-PG{p}")],
+                        rn=f"hports-port{p}-typ-range", name=f"port{p}") for p in range(1, ports + 1)]
+        profiles.append(mo('infraAccPortP', selectors, dn=f"uni/infra/accportprof-Leaf{n}", name=f"Leaf{n}"))
+    switches = [mo('infraNodeP', [mo('infraLeafS', [mo('infraNodeBlk', rn='nodeblk-b', from_=str(n), to_=str(n))],
+                                     rn='leaves-s-typ-range', name='s'),
+                                  mo('infraRsAccPortP', rn=f"rsaccPortP-[uni/infra/accportprof-Leaf{n}]",
+                                     tDn=f"uni/infra/accportprof-Leaf{n}")],
+                   dn=f"uni/infra/nprof-Leaf{n}", name=f"Leaf{n}") for n in node_ids]
+    return {'ethpmPhysIf': [payload(phys)], 'fvRsPathAtt': [payload(paths)],
+            'infraAccPortP': [payload(profiles)], 'infraNodeP': [payload(switches)]}
+
+
+def recorded_payloads(directory):
+    payloads = {}
+    for class_name in CLASSES:
+        for path in sorted(glob.glob(os.path.join(directory, f"{class_name}.*.json"))):
+            with open(path, encoding="utf-8") as record:
+                payloads.setdefault(class_name, []).append(record.read())
+    return payloads
+
+
+def decode_rest(class_name, pages):
+    return sum(len(rows) for page in pages for rows in json_rows(class_name, json.loads(page)['imdata']).values())
+
+
+def decode_cobra(class_name, pages):
+    from cobra.internal.codec.jsoncodec import fromJSONStr
+
+    return sum(len(rows) for page in pages for rows in extract_rows(class_name, fromJSONStr(page)).values())
+
+
+def run(label, func, class_name, pages):
+    started = time.perf_counter()
+    rows = func(class_name, pages)
+    return label, rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cobra against raw JSON decoding of report payloads.")
+    parser.add_argument('--payloads', metavar='DIR', help="recorded payloads (<class>.<page>.json) to decode")
+    parser.add_argument('--nodes', type=int, default=40, help="synthetic leaves (default: 40)")
+    parser.add_argument('--ports', type=int, default=48, help="synthetic ports per leaf (default: 48)")
+    parser.add_argument('--epgs', type=int, default=20, help="synthetic EPG bindings per port (default: 20)")
+    parser.add_argument('--results', metavar='FILE', help="also write the timings to FILE as JSON")
+    args = parser.parse_args()
+
+    decoders = [("raw JSON", decode_rest)]
+    try:
+        import cobra.internal.codec.jsoncodec  # only to see whether the SDK is there
+        decoders.insert(0, ("cobra MOs", decode_cobra))
+    except ImportError:
+        print("cobra SDK not installed: timing the raw JSON side only.")
+
+    if args.payloads:
+        payloads = recorded_payloads(args.payloads)
+        print(f"Decoding recorded payloads from {args.payloads}\n")
+    else:
+        payloads = synthetic_payloads(args.nodes, args.ports, args.epgs)
+        print(f"Decoding synthetic payloads: {args.nodes} leaves x {args.ports} ports, {args.epgs} EPGs per port\n")
+
+    totals = {}
+    results = []
+    for class_name, pages in payloads.items():
+        size = sum(len(page) for page in pages)
+        for label, func in decoders:
+            label, rows, elapsed = run(label, func, class_name, pages)
+            totals[label] = totals.get(label, 0.0) + elapsed
+            results.append({'class': class_name, 'decoder': label, 'bytes': size, 'rows': rows,
+                            'seconds': round(elapsed, 4)})
+            print(f"{class_name:<14} {label:<10} {size / 1e6:8.1f} MB {rows:9,} rows {elapsed:8.2f}s")
+    print()
+    for label, elapsed in totals.items():
+        print(f"{'total':<14} {label:<10} {elapsed:8.2f}s")
+    if len(totals) == 2 and totals["raw JSON"]:
+        print(f"raw JSON is {totals['cobra MOs'] / totals['raw JSON']:.1f}x faster than cobra MOs")
+
+    if args.results:
+        with open(args.results, 'w', encoding="utf-8") as results_file:
+            json.dump({'payloads': args.payloads or f"synthetic {args.nodes}x{args.ports}x{args.epgs}",
+                       'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': results,
+                       'totals': {label: round(elapsed, 4) for label, elapsed in totals.items()}},
+                      results_file, indent=2)
+        print(f"Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from aci_mock_apic import MOCK_PORT
+from aci_session import run_with_credentials
+
+# End-to-end benchmark: starts aci_mock_apic.py with a synthetic fabric, runs
+# every script against it in a scratch directory and records wall time, API
+# calls, bytes on the wire and peak RSS per run. Usage:
+#   python bench_aci_scripts.py --leaves 200 --ports 48 --epgs 5000 --results run.json
+#   python bench_aci_scripts.py ... --compare run.json   # exit 1 on a regression
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (name, script and arguments); the report runs first, the others read its CSV
+RUNS = [
+    ('report', ['aci_port_mapping_full.py']),
+    ('cleanup-ports', ['cleanup_down_ports.py', 'aci_port_epg_report.csv']),
+    ('remove-epg-paths', ['aci_remove_multi_epg_from_csv.py']),
+    ('remove-vmm-domain', ['remove_old_VMM.py', '--all']),
+]
+APPLY_RUNS = [
+    ('cleanup-ports-apply', ['cleanup_down_ports.py', '--apply', 'cleanup_down_ports_plan.jsonl']),
+    ('remove-epg-paths-apply', ['aci_remove_multi_epg_from_csv.py', '--apply', 'epg_remove_path_plan.jsonl']),
+    ('remove-vmm-domain-apply', ['remove_old_VMM.py', '--apply', 'remove_old_VMM_plan.jsonl']),
+]
+METRICS = ['seconds', 'api_calls', 'bytes', 'peak_rss_mb']
+
+
+def mock_stats(url, reset=False):
+    with urllib.request.urlopen(f"{url}/mock/{'reset' if reset else 'stats.json'}") as response:
+        return json.loads(response.read())
+
+
+def run_script(name, argv, url, workdir, log):
+    mock_stats(url, reset=True)
+    started = time.perf_counter()
+    returncode, usage = run_with_credentials([os.path.join(HERE, argv[0]), *argv[1:]], workdir, log,
+                                             url, 'admin', 'password')
+    seconds = time.perf_counter() - started
+    stats = mock_stats(url)
+    return {
+        'name': name,
+        'exit': returncode,
+        'seconds': round(seconds, 3),
+        'api_calls': stats.get('requests', 0),
+        'bytes': stats.get('bytes_in', 0) + stats.get('bytes_out', 0),
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+        'deleted_mos': stats.get('deleted_mos', 0),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = {run['name']: run for run in json.load(baseline_file)['runs']}
+    regressions = []
+    for run in results:
+        before = baseline.get(run['name'])
+        if not before:
+            continue
+        for metric in METRICS:
+            if before[metric] and run[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{run['name']} {metric}: {before[metric]} -> {run[metric]} "
+                                   f"(+{(run[metric] / before[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every script against a local mock APIC and record its cost.")
+    parser.add_argument('--leaves', type=int, default=200, help="leaf switches (default: 200)")
+    parser.add_argument('--ports', type=int, default=48, help="access ports per leaf (default: 48)")
+    parser.add_argument('--epgs', type=int, default=5000, help="EPGs (default: 5000)")
+    parser.add_argument('--bindings-per-epg', type=int, default=4, help="static bindings per EPG (default: 4)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every API request (default: 0)")
+    parser.add_argument('--port', type=int, default=MOCK_PORT, help=f"mock APIC port (default: {MOCK_PORT})")
+    parser.add_argument('--apply', action='store_true', help="also apply each dry-run plan (commits to the mock)")
+    parser.add_argument('--workdir', help="directory for script outputs (default: a fresh temporary directory)")
+    parser.add_argument('--results', metavar='FILE', help="write the measurements as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="flag metrics worse than a previous --results file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown for --compare (default: 0.2)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='aci_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    url = f"http://127.0.0.1:{args.port}"
+    mock = subprocess.Popen([sys.executable, os.path.join(HERE, 'aci_mock_apic.py'), '--port', str(args.port),
+                             '--leaves', str(args.leaves), '--ports', str(args.ports), '--epgs', str(args.epgs),
+                             '--bindings-per-epg', str(args.bindings_per_epg), '--latency', str(args.latency)],
+                            stdout=subprocess.PIPE, text=True)
+    print(mock.stdout.readline().strip())
+
+    results = []
+    try:
+        with open(os.path.join(workdir, 'bench.log'), 'w') as log:
+            for name, argv in RUNS + (APPLY_RUNS if args.apply else []):
+                log.write(f"\n===== {name}: {' '.join(argv)} =====\n")
+                log.flush()
+                result = run_script(name, argv, url, workdir, log)
+                results.append(result)
+                print(f"{name:<24} exit={result['exit']:<3} {result['seconds']:8.2f}s {result['api_calls']:6} calls "
+                      f"{result['bytes'] / 1e6:9.2f} MB {result['peak_rss_mb']:8.1f} MB RSS"
+                      f"{'  deleted=' + str(result['deleted_mos']) if result['deleted_mos'] else ''}")
+    finally:
+        mock.terminate()
+        mock.wait()
+    print(f"\nScript output in {os.path.join(workdir, 'bench.log')}")
+
+    if args.results:
+        with open(args.results, 'w', encoding="utf-8") as results_file:
+            json.dump({'fabric': {'leaves': args.leaves, 'ports': args.ports, 'epgs': args.epgs,
+                                  'bindings_per_epg': args.bindings_per_epg, 'latency': args.latency},
+                       'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': results}, results_file, indent=2)
+        print(f"Results written to {args.results}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESSION] {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
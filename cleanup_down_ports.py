@@ -1,16 +1,32 @@
 import sys
+import argparse
 import csv
-import getpass
 import urllib3
-import cobra.mit.access
-import cobra.mit.request
-import cobra.mit.session
-from cobra.internal.codec.xmlcodec import toXMLStr
+
+from aci_bulk import query_by_dns, query_node_class
+from aci_commit import CommitEngine, file_digest, format_summary, run_id
+from aci_dn import parse_dn, selector_dn
+from aci_metrics import add_metrics_arguments, start_metrics
+from aci_output import Output, add_output_arguments
+from aci_paths import load_path_index
+from aci_plan import PlanWriter, add_plan_arguments, apply_plan, read_plan
+from aci_session import apic_url, credentials_given, login, prompt_credentials
+from aci_snapshot import add_snapshot_arguments, open_snapshot
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # --- SETTINGS ---
 DRY_RUN = True  # SET TO False TO ACTUALLY DELETE
+INPUT_COLUMNS = ('Node', 'Interface', 'Status', 'Interface_Profile', 'Selector')
+JOURNAL_FILE = 'cleanup_down_ports_journal.jsonl'  # Append-only log of committed DNs and run summaries
+PLAN_FILE = 'cleanup_down_ports_plan.jsonl'  # Written by dry runs, consumed by --apply
+
+def local_selector_mo(sel_dn):
+    # Selector MO built from its DN, for dry runs answered from the snapshot
+    import cobra.model.infra
+
+    dn = parse_dn(sel_dn)
+    return cobra.model.infra.HPortS(f"uni/infra/accportprof-{dn.profile}", dn.selector, "range")
 
 def parse_inventory_file(file_path):
     records = []
@@ -18,6 +34,9 @@ def parse_inventory_file(file_path):
     with open(file_path, encoding="utf-8") as file_handle:
         # Using csv.DictReader with tab delimiter to perfectly match your file
         reader = csv.DictReader(file_handle, delimiter=',')
+        missing = [column for column in INPUT_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{file_path} is missing column(s) {', '.join(missing)}; expected a port report CSV")
         
         for line_number, row in enumerate(reader, start=2):
             # Fallback if the file got converted to spaces instead of tabs during copy/paste
@@ -46,52 +65,90 @@ def parse_inventory_file(file_path):
 
     return records
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python cleanup_down_ports.py <inventory_file.csv/txt>")
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Delete interface selectors whose ports are all down.")
+    parser.add_argument("input_file", nargs="?", help="port report CSV (aci_port_epg_report.csv format)")
+    add_plan_arguments(parser, PLAN_FILE)
+    add_output_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
+
+def run(args):
+    metrics = start_metrics('cleanup_down_ports', args)
+
+    if not args.input_file and not args.apply:
+        print("Error: an inventory file is required unless --apply is given.")
         sys.exit(1)
-        
-    input_file = sys.argv[1]
 
-    print("=== APIC Authentication ===")
-    apic = input("APIC IP or hostname: ").strip()
-    username = input("Username: ").strip()
-    password = getpass.getpass("Password: ")
+    # 1. Parse the input before asking for credentials
+    records = []
+    if args.apply:
+        try:
+            read_plan(args.apply)
+        except (OSError, ValueError) as error:
+            print(f"Error: cannot read plan {args.apply}: {error}")
+            sys.exit(1)
+    else:
+        print("Reading inventory file...")
+        try:
+            records = parse_inventory_file(args.input_file)
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}")
+            sys.exit(1)
+        if not records:
+            print("No valid 'down' ports with profiles found in input file. Exiting.")
+            return
+
+        print(f"Found {len(records)} 'down' ports to process.")
 
-    if not apic or not username or not password:
+    print("\n=== APIC Authentication ===")
+    apic, username, password = prompt_credentials()
+
+    if not credentials_given(apic, username, password):
         print("Error: APIC IP, username, and password are all required. Exiting.")
         sys.exit(1)
+    print(f"Mode: {'APPLY ' + args.apply if args.apply else 'DRY-RUN' if DRY_RUN else 'EXECUTE'}")
 
-    # 1. Parse the TSV file for DOWN ports
-    print("\nReading inventory file...")
-    records = parse_inventory_file(input_file)
-    if not records:
-        print("No valid 'down' ports with profiles found in input file. Exiting.")
-        return
+    # 2. Login to APIC, unless a fresh snapshot answers every dry-run check
+    use_snapshot = args.snapshot and DRY_RUN and not args.apply
+    if args.snapshot and not use_snapshot:
+        print("Note: --snapshot only applies to dry runs; safety checks use live APIC state.")
+    mo_directory = None
+    if not use_snapshot:
+        try:
+            mo_directory = login(apic, username, password, metrics)
+        except Exception as error:
+            print(f"Login failed: {error}")
+            sys.exit(1)
 
-    print(f"Found {len(records)} 'down' ports to process.")
-    print(f"Mode: {'DRY-RUN' if DRY_RUN else 'EXECUTE'}")
+    def connect():
+        nonlocal mo_directory
+        if mo_directory is None:
+            mo_directory = login(apic, username, password, metrics)
+        return mo_directory
 
-    # 2. Login to APIC
-    login_session = cobra.mit.session.LoginSession(
-        f"https://{apic}",
-        username,
-        password,
-        secure=False,
-    )
-    mo_directory = cobra.mit.access.MoDirectory(login_session)
-
-    try:
-        mo_directory.login()
-        print("Successfully logged into APIC.\n")
-    except Exception as error:
-        print(f"Login failed: {error}")
+    if args.apply:
+        metrics.begin('apply')
+        try:
+            summary = apply_plan(mo_directory, args.apply, JOURNAL_FILE, apic_url(apic), args.any_apic)
+        except Exception as error:
+            print(f"Apply failed: {error}")
+            sys.exit(1)
+        finally:
+            mo_directory.logout()
+        if summary['failed']:
+            sys.exit(1)
         return
 
-    config_request = cobra.mit.request.ConfigRequest()
+    journal_run = run_id('cleanup_down_ports', file_digest(args.input_file))
+    commit_engine = CommitEngine(mo_directory, JOURNAL_FILE, journal_run, apic_url(apic)) if not DRY_RUN else None
+    plan = PlanWriter(args.plan, "cleanup_down_ports", apic) if DRY_RUN else None
+    out = Output(args.output, args.jsonl)
     ports_verified_down = 0
     ports_up_skipped = 0
     queued = 0
+    failed = False
 
     try:
         # Group ports by their selector DN
@@ -103,63 +160,101 @@ def main():
             int_prof = item["int_prof"]
             selector = item["selector"]
             
-            selector_dn = f"uni/infra/accportprof-{int_prof}/hports-{selector}-typ-range"
+            sel_dn = selector_dn(int_prof, selector)
             
-            if selector_dn not in selectors_to_check:
-                selectors_to_check[selector_dn] = []
+            if sel_dn not in selectors_to_check:
+                selectors_to_check[sel_dn] = []
                 
-            selectors_to_check[selector_dn].append({"node": node, "port": port})
+            selectors_to_check[sel_dn].append({"node": node, "port": port})
+
+        # Prefetch everything the safety checks need in bulk: the pod of every
+        # node, all ethpmPhysIf of each referenced node, and the referenced
+        # selectors in a few DN-filtered queries. The checks below only read
+        # these dictionaries.
+        metrics.begin('prefetch')
+        if use_snapshot:
+            snapshot = open_snapshot(args, apic_url(apic), ['ethpmPhysIf', 'infraAccPortP', 'fabricNode'], connect)
+            paths = snapshot.path_index()
+            oper_state = snapshot.oper_state_by_dn()
+            selector_mos = {dn: local_selector_mo(dn) for dn in snapshot.selector_dns() if dn in selectors_to_check}
+            snapshot.close()
+        else:
+            nodes = sorted({p["node"] for ports in selectors_to_check.values() for p in ports})
+            out.summary(f"Prefetching port state for {len(nodes)} node(s) and {len(selectors_to_check)} selector(s)...")
+            paths = load_path_index(mo_directory, bundles=False)
+            oper_state = {}
+            for node in nodes:
+                if paths.pod(node) is None:
+                    out.summary(f"[WARNING] Node {node} is not in the fabric; its ports will be reported NOT FOUND.")
+                    continue
+                for phys_mo in query_node_class(mo_directory, paths.pod(node), node, 'ethpmPhysIf'):
+                    oper_state[str(phys_mo.dn)] = phys_mo.operSt
+            selector_mos = query_by_dns(mo_directory, 'infraHPortS', selectors_to_check.keys())
 
         # Now evaluate safety PER SELECTOR
-        for selector_dn, ports in selectors_to_check.items():
-            print(f"\nEvaluating Selector: {selector_dn}")
+        metrics.begin('selector-loop')
+        for sel_dn, ports in selectors_to_check.items():
+            out.detail(f"\nEvaluating Selector: {sel_dn}")
             
             safe_to_delete = True
             
             # Check every port inside this selector
             for p in ports:
-                port_phys_dn = f"topology/pod-1/node-{p['node']}/sys/phys-[{p['port']}]/phys"
-                phys_mo = mo_directory.lookupByDn(port_phys_dn)
+                port_phys_dn = paths.phys(p['node'], p['port'])
+                oper_st = oper_state.get(port_phys_dn)
                 
-                if not phys_mo:
-                    print(f"  -> [NOT FOUND] Port {p['node']} {p['port']} missing in APIC.")
+                if oper_st is None:
+                    out.object("NOT FOUND", f"  -> [NOT FOUND] Port {p['node']} {p['port']} missing in APIC.",
+                               dn=port_phys_dn, selector=sel_dn)
                     continue
                     
-                if phys_mo.operSt == "up":
-                    print(f"  -> [DANGER] Port {p['node']} {p['port']} is UP! Aborting deletion for this selector.")
+                if oper_st == "up":
+                    out.object("DANGER", f"  -> [DANGER] Port {p['node']} {p['port']} is UP! Aborting deletion for this selector.",
+                               dn=port_phys_dn, selector=sel_dn)
                     safe_to_delete = False
                     ports_up_skipped += 1
                     break # We found an UP port, no need to check the rest in this selector
                 else:
-                    print(f"  -> [DOWN] Port {p['node']} {p['port']} is verified DOWN.")
+                    out.object("DOWN", f"  -> [DOWN] Port {p['node']} {p['port']} is verified DOWN.",
+                               dn=port_phys_dn, selector=sel_dn)
                     ports_verified_down += 1
                     
             # Only queue the selector for deletion if NO ports were UP
             if safe_to_delete:
-                selector_mo = mo_directory.lookupByDn(selector_dn)
+                selector_mo = selector_mos.get(sel_dn)
                 if not selector_mo:
-                    print(f"  -> [ALREADY DELETED] Selector not found in APIC.")
+                    out.object("ALREADY DELETED", f"  -> [ALREADY DELETED] Selector not found in APIC.", dn=sel_dn)
                     continue
                     
-                print(f"  -> [SAFE] All evaluated ports are DOWN. Queuing selector for deletion.")
+                out.object("SAFE", f"  -> [SAFE] All evaluated ports are DOWN. Queuing selector for deletion.", dn=sel_dn)
                 selector_mo.delete()
+                out.xml(selector_mo, "  -> [XML] ")
                 queued += 1
                 if not DRY_RUN:
-                    config_request.addMo(selector_mo)
+                    commit_engine.add(selector_mo)
                 else:
-                    print("  -> [DRY-RUN] No commit will be performed.")
+                    plan.add(sel_dn, "infraHPortS", [dn for dn in (paths.phys(p['node'], p['port']) for p in ports) if dn])
+                    out.detail("  -> [DRY-RUN] No commit will be performed.")
             else:
-                print(f"  -> [SKIPPED] Selector {selector_dn} kept because at least one port is UP.")
+                out.object("SKIPPED", f"  -> [SKIPPED] Selector {sel_dn} kept because at least one port is UP.", dn=sel_dn)
 
         # 3. Commit changes to APIC
+        out.close()
+        metrics.begin('commit')
         if not DRY_RUN and queued > 0:
             print(f"\nCommitting {queued} deletion(s) to APIC...")
-            mo_directory.commit(config_request)
-            print("SUCCESS: Changes committed.")
+            summary = commit_engine.commit()
+            if summary['failed']:
+                failed = True
+                print(f"PARTIAL: {summary['failed']} deletion(s) failed, re-run to retry them (see {JOURNAL_FILE}).")
+            else:
+                print("SUCCESS: Changes committed.")
+            print(f"Commit: {format_summary(summary)}")
         elif not DRY_RUN and queued == 0:
             print("\nNo matching configurations found to delete. Nothing committed.")
         else:
-            print("\nDry-run complete. Set DRY_RUN=False to apply changes.")
+            print(f"\nDry-run complete. {plan.count} deletion(s) written to {args.plan}; "
+                  f"run with --apply {args.plan} to commit them.")
 
         print(
             f"\nSummary: Total Parsed={len(records)}, Verified DOWN={ports_verified_down}, "
@@ -168,8 +263,19 @@ def main():
 
     except Exception as error:
         print(f"Execution failed: {error}")
+        failed = True
     finally:
-        mo_directory.logout()
+        out.close()
+        if plan:
+            plan.close()
+        if mo_directory:
+            metrics.begin('logout')
+            mo_directory.logout()
+    if failed:
+        sys.exit(1)
+
+def main():
+    run(build_parser().parse_args())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
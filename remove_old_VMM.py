@@ -1,10 +1,15 @@
 import sys
-import getpass
+import argparse
 import urllib3
-import cobra.mit.access
 import cobra.mit.request
-import cobra.mit.session
-from cobra.internal.codec.xmlcodec import toXMLStr
+
+from aci_commit import CommitEngine, file_digest, format_summary, run_id
+from aci_dn import dom_att_dn, epg_dn, parse_dn
+from aci_metrics import add_metrics_arguments, start_metrics
+from aci_output import Output, add_output_arguments
+from aci_plan import PlanWriter, add_plan_arguments, apply_plan, read_plan
+from aci_session import apic_url, credentials_given, login, prompt_credentials
+from aci_snapshot import add_snapshot_arguments, open_snapshot
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -12,6 +17,8 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 DRY_RUN = True  # SET TO False TO ACTUALLY DELETE
 TENANT = "Production-TNT"
 DOMAIN_DN = "uni/vmmp-VMware/dom-W7_MX1000_VDS-New"
+JOURNAL_FILE = "remove_old_VMM_journal.jsonl"  # Append-only log of committed DNs and run summaries
+PLAN_FILE = "remove_old_VMM_plan.jsonl"  # Written by dry runs, consumed by --apply
 
 
 def parse_input_file(file_path):
@@ -53,95 +60,195 @@ def parse_input_file(file_path):
     return records, malformed
 
 
-def main():
-    # 1. Get input file from command line argument
-    if len(sys.argv) < 2:
-        print("Usage: python remove_old_VMM.py <input_file>")
-        sys.exit(1)
-        
-    input_file = sys.argv[1]
+def query_domain_attachments(mo_directory):
+    # Every fvRsDomAtt in TENANT that points at DOMAIN_DN, in one class query
+    prop_filter = (
+        f'and(eq(fvRsDomAtt.tDn,"{DOMAIN_DN}"),'
+        f'wcard(fvRsDomAtt.dn,"uni/tn-{TENANT}/"))'
+    )
+    query = cobra.mit.request.ClassQuery("fvRsDomAtt")
+    query.propFilter = prop_filter
+    return {str(mo.dn): mo for mo in mo_directory.query(query)}
 
-    # 2. Interactively ask for credentials and APIC details
-    print("=== APIC Authentication ===")
-    apic = input("APIC IP or hostname: ").strip()
-    username = input("Username: ").strip()
-    password = getpass.getpass("Password: ")
 
-    if not apic or not username or not password:
-        print("Error: APIC IP, username, and password are all required. Exiting.")
-        sys.exit(1)
+def local_domain_attachments(snapshot):
+    # Same shape as query_domain_attachments(), answered from the snapshot
+    import cobra.model.fv
 
-    # 3. Parse the file
-    records, malformed = parse_input_file(input_file)
-    if not records:
-        print("No valid AP/EPG entries found in input file. Exiting.")
-        return
+    attachments = {}
+    for relation_dn in snapshot.dom_att_dns(TENANT, DOMAIN_DN):
+        dn = parse_dn(relation_dn)
+        attachments[relation_dn] = cobra.model.fv.RsDomAtt(epg_dn(dn.tenant, dn.ap, dn.epg), tDn=DOMAIN_DN)
+    return attachments
 
-    print(f"\nParsed {len(records)} unique AP/EPG entries ({malformed} malformed lines skipped).")
-    print(f"Mode: {'DRY-RUN' if DRY_RUN else 'EXECUTE'}")
 
-    # 4. Login to APIC
-    login_session = cobra.mit.session.LoginSession(
-        f"https://{apic}",
-        username,
-        password,
-        secure=False,
-    )
-    mo_directory = cobra.mit.access.MoDirectory(login_session)
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description=f"Remove the {DOMAIN_DN} attachment from EPGs in {TENANT}.")
+    parser.add_argument("input_file", nargs="?", help="file listing Application Profile and EPG per line")
+    parser.add_argument("--all", action="store_true",
+                        help="remove every attachment to the domain in the tenant, no input file needed")
+    add_plan_arguments(parser, PLAN_FILE)
+    add_output_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
 
-    try:
-        mo_directory.login()
-        print("Successfully logged into APIC.\n")
-    except Exception as error:
-        print(f"Login failed: {error}")
+
+def run(args):
+    metrics = start_metrics('remove_old_VMM', args)
+
+    # 1. An input file (or --all) is required
+    if not args.input_file and not args.all and not args.apply:
+        print("Error: an input file is required unless --all or --apply is given.")
+        sys.exit(1)
+
+    # 2. Parse the file before asking for credentials
+    records, malformed = [], 0
+    if args.apply:
+        try:
+            read_plan(args.apply)
+        except (OSError, ValueError) as error:
+            print(f"Error: cannot read plan {args.apply}: {error}")
+            sys.exit(1)
+    elif args.input_file and not args.all:
+        try:
+            records, malformed = parse_input_file(args.input_file)
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}")
+            sys.exit(1)
+        if not records:
+            print("No valid AP/EPG entries found in input file. Exiting.")
+            return
+
+        print(f"Parsed {len(records)} unique AP/EPG entries ({malformed} malformed lines skipped).")
+    else:
+        print(f"No input file: targeting every EPG in {TENANT} attached to {DOMAIN_DN}.")
+
+    # 3. Interactively ask for credentials and APIC details
+    print("\n=== APIC Authentication ===")
+    apic, username, password = prompt_credentials()
+
+    if not credentials_given(apic, username, password):
+        print("Error: APIC IP, username, and password are all required. Exiting.")
+        sys.exit(1)
+    print(f"Mode: {'APPLY ' + args.apply if args.apply else 'DRY-RUN' if DRY_RUN else 'EXECUTE'}")
+
+    # 4. Login to APIC, unless a fresh snapshot answers the dry run
+    use_snapshot = args.snapshot and DRY_RUN and not args.apply
+    if args.snapshot and not use_snapshot:
+        print("Note: --snapshot only applies to dry runs; attachments are read from live APIC state.")
+    mo_directory = None
+    if not use_snapshot:
+        try:
+            mo_directory = login(apic, username, password, metrics)
+        except Exception as error:
+            print(f"Login failed: {error}")
+            sys.exit(1)
+
+    def connect():
+        nonlocal mo_directory
+        if mo_directory is None:
+            mo_directory = login(apic, username, password, metrics)
+        return mo_directory
+
+    if args.apply:
+        metrics.begin('apply')
+        try:
+            summary = apply_plan(mo_directory, args.apply, JOURNAL_FILE, apic_url(apic), args.any_apic)
+        except Exception as error:
+            print(f"Apply failed: {error}")
+            sys.exit(1)
+        finally:
+            mo_directory.logout()
+        if summary["failed"]:
+            sys.exit(1)
         return
 
-    config_request = cobra.mit.request.ConfigRequest()
+    # Same input, same run
+    journal_run = run_id('remove_old_VMM', TENANT, DOMAIN_DN, 'all' if args.all else file_digest(args.input_file))
+    commit_engine = CommitEngine(mo_directory, JOURNAL_FILE, journal_run, apic_url(apic)) if not DRY_RUN else None
+    plan = PlanWriter(args.plan, "remove_old_VMM", apic) if DRY_RUN else None
+    out = Output(args.output, args.jsonl)
     found = 0
     queued = 0
     missing = 0
+    failed = False
 
     try:
-        for ap_name, epg_name in records:
-            relation_dn = (
-                f"uni/tn-{TENANT}/ap-{ap_name}/epg-{epg_name}"
-                f"/rsdomAtt-[{DOMAIN_DN}]"
-            )
-            relation_mo = mo_directory.lookupByDn(relation_dn)
+        metrics.begin('prefetch')
+        if use_snapshot:
+            snapshot = open_snapshot(args, apic_url(apic), ["fvRsDomAtt"], connect)
+            attachments = local_domain_attachments(snapshot)
+            snapshot.close()
+        else:
+            attachments = query_domain_attachments(mo_directory)
+        print(f"Found {len(attachments)} attachment(s) to {DOMAIN_DN} in {TENANT}.\n")
+
+        if args.all:
+            targets = sorted(attachments)
+        else:
+            targets = [dom_att_dn(TENANT, ap_name, epg_name, DOMAIN_DN) for ap_name, epg_name in records]
+
+        metrics.begin('match')
+        for relation_dn in targets:
+            relation_mo = attachments.get(relation_dn)
 
             if not relation_mo:
                 missing += 1
-                print(f"[NOT FOUND] {relation_dn}")
+                out.object("NOT FOUND", f"[NOT FOUND] {relation_dn}", dn=relation_dn)
                 continue
 
             found += 1
             relation_mo.delete()
-            print(f"[MATCH] {relation_dn}")
-            print(f"[XML] {toXMLStr(relation_mo)}")
+            out.object("MATCH", f"[MATCH] {relation_dn}", dn=relation_dn)
+            out.xml(relation_mo, "[XML] ")
 
             if not DRY_RUN:
-                config_request.addMo(relation_mo)
+                commit_engine.add(relation_mo)
                 queued += 1
-                print("[QUEUED] Marked for deletion")
+                out.detail("[QUEUED] Marked for deletion")
             else:
-                print("[DRY-RUN] No commit will be performed")
+                plan.add(relation_dn, "fvRsDomAtt")
+                out.detail("[DRY-RUN] No commit will be performed")
+
+        out.close()
 
+        metrics.begin('commit')
         if not DRY_RUN and queued > 0:
             print(f"\nCommitting {queued} deletion(s) to APIC...")
-            mo_directory.commit(config_request)
-            print("SUCCESS: Changes committed.")
+            summary = commit_engine.commit()
+            if summary["failed"]:
+                failed = True
+                print(f"PARTIAL: {summary['failed']} deletion(s) failed, re-run to retry them (see {JOURNAL_FILE}).")
+            else:
+                print("SUCCESS: Changes committed.")
+            print(f"Commit: {format_summary(summary)}")
         elif not DRY_RUN and queued == 0:
             print("\nNo matching domain attachments found. Nothing committed.")
         else:
-            print("\nDry-run complete. Set DRY_RUN=False to apply changes.")
+            print(f"\nDry-run complete. {plan.count} deletion(s) written to {args.plan}; "
+                  f"run with --apply {args.plan} to commit them.")
 
         print(
-            f"\nSummary: parsed={len(records)}, found={found}, missing={missing}, queued={queued}, malformed={malformed}"
+            f"\nSummary: parsed={len(records) if records else 'n/a'}, found={found}, missing={missing}, queued={queued}, malformed={malformed}"
         )
     except Exception as error:
         print(f"Execution failed: {error}")
+        failed = True
     finally:
-        mo_directory.logout()
+        out.close()
+        if plan:
+            plan.close()
+        if mo_directory:
+            metrics.begin('logout')
+            mo_directory.logout()
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    run(build_parser().parse_args())
+
 
 if __name__ == "__main__":
     main()